@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bar_store import BarStore
+from compact_bars import as_frame, to_float64
+from sr_analyzer import SupportResistanceAnalyzer, FeatureCache
+from sr_batch import normalize_tickers, results_to_rows
+
+EVENT_COLUMNS = ['config', 'ticker', 'datetime', 'method', 'label', 'level', 'kind', 'distance',
+                 'outcome', 'touch_bars', 'resolve_bars']
+# 結果: untouched - 未觸及；bounce - 觸及後反彈；break - 收市價穿越；open - 觸及後未分勝負
+OUTCOMES = ('untouched', 'bounce', 'break', 'open')
+# level_events 每批處理的水平數，限制 (水平數 x horizon) 矩陣的內存
+EVENT_CHUNK = 20000
+# run_backtest(summarize=True) 時每隻股票的匯總維度
+SUMMARY_KEYS = ['config', 'ticker', 'method']
+
+
+def _first_true(mask, default):
+    """每行第一個 True 的列號，沒有時為 default"""
+    first = np.argmax(mask, axis=1)
+    return np.where(mask.any(axis=1), first, default)
+
+
+def level_events(high, low, close, starts, levels, horizon, touch_pct=0.002, bounce_pct=0.01,
+                 chunk_size=EVENT_CHUNK):
+    """
+    批量判斷每個水平在之後 horizon 根K線內的表現 (全部水平一次向量化計算)
+    支撐: 最低價進入水平 touch_pct 以內為觸及；觸及之後的K線 (不含觸及K線) 最高價升到水平之上
+          bounce_pct 為反彈 (單根K線無法判斷最高價是否在觸及之前出現)；
+          收市價跌破水平 touch_pct 為突破 (觸及K線本身也算)，同一根K線同時出現時算突破
+    阻力: 方向相反 (價格取負號後按支撐計算)
+    :param starts: 每個水平開始觀察的K線位置
+    :param levels: 水平價格；低於 starts 前一根收市價的為支撐，其餘為阻力
+    :return: dict: kind, outcome (OUTCOMES 序號), touch_bars, resolve_bars (從 starts 起的K線數，未發生為 -1)
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    starts = np.asarray(starts, dtype=np.int64)
+    levels = np.asarray(levels, dtype=np.float64)
+    parts = [_level_events_chunk(high, low, close, starts[i:i + chunk_size], levels[i:i + chunk_size],
+                                 horizon, touch_pct, bounce_pct)
+             for i in range(0, len(levels), chunk_size)]
+    if not parts:
+        return {'kind': np.zeros(0, dtype='<U10'), 'outcome': np.zeros(0, dtype=np.int64),
+                'touch_bars': np.zeros(0, dtype=np.int64), 'resolve_bars': np.zeros(0, dtype=np.int64)}
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def _level_events_chunk(high, low, close, starts, levels, horizon, touch_pct, bounce_pct):
+    # 末尾補 NaN，讓每個窗口都是完整的 horizon 根 (NaN 的比較結果為 False)
+    pad = np.full(horizon, np.nan)
+    windows = [sliding_window_view(np.concatenate([a, pad]), horizon)[starts]
+               for a in (high, low, close)]
+    support = levels < close[starts - 1]
+    sign = np.where(support, 1.0, -1.0)[:, None]
+    # 阻力取負號: 最高價與最低價互換
+    w_high = np.where(sign > 0, windows[0], -windows[1])
+    w_low = np.where(sign > 0, windows[1], -windows[0])
+    w_close = windows[2] * sign
+    level = (levels * sign[:, 0])[:, None]
+    band = np.abs(levels)[:, None]
+
+    touch = _first_true(w_low <= level + band * touch_pct, horizon)
+    broken = _first_true(w_close < level - band * touch_pct, horizon)
+    after_touch = np.arange(horizon)[None, :] > touch[:, None]
+    bounced = _first_true(after_touch & (w_high >= level + band * bounce_pct), horizon)
+
+    outcome = np.where(touch >= horizon, 0,
+                       np.where(broken <= bounced, np.where(broken < horizon, 2, 3), 1))
+    resolve = np.where(outcome == 1, bounced, np.where(outcome == 2, broken, -1))
+    return {
+        'kind': np.where(support, 'support', 'resistance'),
+        'outcome': outcome,
+        'touch_bars': np.where(touch < horizon, touch, -1),
+        'resolve_bars': resolve,
+    }
+
+
+def _normalize_configs(configs):
+    """{名稱: profile 名稱 或 {'profile': ..., 'params': ...}}"""
+    if isinstance(configs, (list, tuple)):
+        configs = {name: name for name in configs}
+    normalized = {}
+    for name, config in configs.items():
+        if isinstance(config, str):
+            config = {'profile': config}
+        normalized[name] = {'profile': config.get('profile', 'split'), 'params': config.get('params')}
+    return normalized
+
+
+def walk_forward_levels(df, configs, lookback=960, step=60, max_distance=0.1):
+    """
+    滾動計算水平: 每 step 根K線用之前 lookback 根重新分析一次
+    同一窗口的所有配置共用一個 FeatureCache (數組、滾動指標、峰值候選、相同參數的方法結果)
+    :param configs: 見 _normalize_configs
+    :param max_distance: 只保留距當時收市價比例以內的水平
+    :return: 每個水平一行: config, start (開始觀察的位置), method, label, level
+    """
+    configs = _normalize_configs(configs)
+    close = to_float64(df['close'])
+    rows = []
+    for t in range(lookback, len(df), step):
+        window = df.iloc[t - lookback:t]
+        features = FeatureCache(window)
+        price = close[t - 1]
+        for name, config in configs.items():
+            try:
+                analyzer = SupportResistanceAnalyzer(window, profile=config['profile'],
+                                                     params=config['params'], features=features)
+                results = analyzer.run_all_analysis()
+            except Exception:
+                continue
+            for row in results_to_rows(None, results):
+                if row['level'] != price and abs(row['level'] - price) <= price * max_distance:
+                    rows.append((name, t, row['method'], row['label'], row['level']))
+    return pd.DataFrame(rows, columns=['config', 'start', 'method', 'label', 'level'])
+
+
+def backtest_frame(ticker, df, configs, lookback=960, step=60, horizon=120,
+                   touch_pct=0.002, bounce_pct=0.01, max_distance=0.1):
+    """一隻股票按所有配置回測，返回事件記錄 (EVENT_COLUMNS)"""
+    configs = _normalize_configs(configs)
+    levels = walk_forward_levels(df, configs, lookback, step, max_distance)
+    if levels.empty:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    # 不同配置常給出相同的水平，每個 (位置, 價格) 只判斷一次
+    pairs, inverse = np.unique(np.column_stack([levels['start'], levels['level']]), axis=0,
+                               return_inverse=True)
+    inverse = inverse.reshape(-1)
+    events = level_events(to_float64(df['high']), to_float64(df['low']), to_float64(df['close']), pairs[:, 0].astype(np.int64), pairs[:, 1],
+                          horizon, touch_pct, bounce_pct)
+    events = {key: values[inverse] for key, values in events.items()}
+
+    starts = levels['start'].to_numpy()
+    price = to_float64(df['close'])[starts - 1]
+    return pd.DataFrame({
+        'config': pd.Categorical(levels['config'], categories=list(configs)),
+        'ticker': ticker,
+        'datetime': df.index[starts],
+        'method': levels['method'],
+        'label': levels['label'],
+        'level': levels['level'],
+        'kind': events['kind'],
+        'distance': (levels['level'] - price) / price * 100,
+        'outcome': pd.Categorical.from_codes(events['outcome'], categories=list(OUTCOMES)),
+        'touch_bars': events['touch_bars'],
+        'resolve_bars': events['resolve_bars'],
+    })[EVENT_COLUMNS]
+
+
+def _backtest_chunk(items, configs, options, summarize=False):
+    events = []
+    for ticker, df in items:
+        try:
+            frame = backtest_frame(ticker, as_frame(df), configs, **options)
+            if summarize:
+                frame = summarize_backtest(frame, by=SUMMARY_KEYS).reset_index()
+            events.append(frame)
+        except Exception as e:
+            print(f"{ticker} 回測失敗: {str(e)}")
+    return events
+
+
+def load_history(tickers, days=60, interval='1m', store=None):
+    """只讀取本地緩存 (不下載) 的最近 days 個交易日，返回 {ticker: DataFrame}"""
+    store = store or BarStore()
+    frames = {}
+    for ticker in normalize_tickers(tickers):
+        df = store.read(ticker, interval, days=days)
+        if not df.empty:
+            frames[ticker] = df
+    return frames
+
+
+def run_backtest(frames, configs=('split', 'split2'), lookback=960, step=60, horizon=120,
+                 touch_pct=0.002, bounce_pct=0.01, max_distance=0.1, max_workers=None, chunk_size=2,
+                 summarize=False):
+    """
+    多隻股票、多個分析配置的滾動回測，按股票分批並行
+    :param frames: {ticker: DataFrame} 或 compact_bars.BarUniverse，見 load_history
+    :param configs: profile 名稱列表，或 {名稱: {'profile': ..., 'params': ...}}
+    :param lookback/step/horizon: 分析用的K線數 / 每隔多少根重新分析 / 之後觀察的K線數
+    :param touch_pct/bounce_pct: 觸及與反彈的價格比例，見 level_events
+    :param summarize: 在工作進程內按 SUMMARY_KEYS 匯總後再返回 (配置很多時避免傳回大量事件記錄)
+    :return: 事件記錄 DataFrame (EVENT_COLUMNS)，用 summarize_backtest 匯總；summarize 時為匯總表
+    """
+    options = {'lookback': lookback, 'step': step, 'horizon': horizon, 'touch_pct': touch_pct,
+               'bounce_pct': bounce_pct, 'max_distance': max_distance}
+    items = list(frames.items())
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    events = []
+    if chunks:
+        max_workers = max_workers or min(len(chunks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_backtest_chunk, chunk, configs, options, summarize) for chunk in chunks]
+            for future in as_completed(futures):
+                try:
+                    events.extend(future.result())
+                except Exception as e:
+                    print(f"回測進程失敗: {str(e)}")
+
+    events = [e for e in events if not e.empty]
+    if not events:
+        return pd.DataFrame(columns=SUMMARY_KEYS if summarize else EVENT_COLUMNS)
+    order = {'config': {name: i for i, name in enumerate(_normalize_configs(configs))},
+             'ticker': {t: i for i, t in enumerate(frames)}}
+    events = pd.concat(events, ignore_index=True)
+    events = events.sort_values(['config', 'ticker'], key=lambda s: s.map(order[s.name]), kind='stable')
+    return events.reset_index(drop=True)
+
+
+def summarize_backtest(events, by=('config',)):
+    """
+    按配置 (及方法等) 匯總: 水平數、觸及率、觸及後的反彈率 / 突破率、平均觸及與結果所需K線數
+    """
+    by = list(by)
+    touched = events['outcome'] != 'untouched'
+    summary = events.assign(
+        touched=touched,
+        bounce=events['outcome'] == 'bounce',
+        broken=events['outcome'] == 'break',
+        touch_bars=events['touch_bars'].where(touched),
+        resolve_bars=events['resolve_bars'].where(events['resolve_bars'] >= 0),
+    ).groupby(by, sort=False, observed=True).agg(
+        levels=('level', 'size'),
+        touches=('touched', 'sum'),
+        bounces=('bounce', 'sum'),
+        breaks=('broken', 'sum'),
+        touch_bars=('touch_bars', 'mean'),
+        resolve_bars=('resolve_bars', 'mean'),
+    )
+    summary['touch_rate'] = summary['touches'] / summary['levels']
+    summary['bounce_rate'] = summary['bounces'] / summary['touches'].where(summary['touches'] > 0)
+    summary['break_rate'] = summary['breaks'] / summary['touches'].where(summary['touches'] > 0)
+    return summary
+
+
+if __name__ == "__main__":
+    # 用法: python backtest.py [天數] [代碼...]
+    # 用本地緩存的 1 分鐘K線比較 split 與 split2 的水平質量
+    DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    WATCHLIST = sys.argv[2:] or ['icct', 'mspr', 'bjdx', 'aapl']
+
+    frames = load_history(WATCHLIST, days=DAYS)
+    if not frames:
+        print("沒有本地緩存的K線 (sr_batch.py / timeframes.py 讀取 1 分鐘K線時會自動緩存)")
+        sys.exit(1)
+    print(f"{len(frames)} 隻股票，共 {sum(len(df) for df in frames.values())} 根K線")
+
+    started = time.perf_counter()
+    events = run_backtest(frames, configs=('split', 'split2'))
+    print(summarize_backtest(events).round(3).to_string())
+    print()
+    print(summarize_backtest(events, by=('config', 'method')).round(3).to_string())
+    print(f"\n回測耗時 {time.perf_counter() - started:.1f} 秒")
@@ -0,0 +1,266 @@
+import json
+import os
+from collections import defaultdict
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from market_data import (OHLCV_COLUMNS, ET_TZ, MAX_LOOKBACK_DAYS, as_et, download_watchlist, get_ohlcv,
+                         period_days)
+
+# 預設存放於專案根目錄 data/bars，可用環境變量 BAR_STORE_DIR 覆蓋
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'bars')
+
+# 下載不到數據的股票/週期在此期間內不再請求 (已退市、沒有該週期數據等)
+NEGATIVE_TTL = pd.Timedelta(hours=12)
+
+
+def _interval_delta(interval):
+    try:
+        return pd.Timedelta(interval)
+    except ValueError:
+        return None
+
+
+def _window_start(interval, days, now):
+    """
+    最近 days 個工作日的第一天 (YYYY-MM-DD)，不早於 Yahoo 可回溯範圍內的第一個工作日
+    完整下載從這一天開始請求，緩存是否足夠也與這一天比較 (不考慮假期，見 BarStore.covered_from)
+    """
+    start = pd.bdate_range(end=now.normalize().tz_localize(None), periods=days)[0]
+    lookback = MAX_LOOKBACK_DAYS.get(interval)
+    if lookback is not None:
+        earliest = (now - pd.Timedelta(days=lookback - 1)).normalize().tz_localize(None)
+        start = max(start, pd.offsets.BDay().rollforward(earliest))
+    return start.strftime('%Y-%m-%d')
+
+
+class BarStore:
+    """
+    本地K線緩存: {root}/{interval}/{TICKER}/{YYYY-MM-DD}.feather
+    每個交易日一個未壓縮的 Feather (Arrow IPC) 文件，讀取時使用記憶體映射
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get('BAR_STORE_DIR') or DEFAULT_ROOT
+
+    def _dir(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker.upper())
+
+    def partitions(self, ticker, interval):
+        """按日期排序的分區文件路徑"""
+        folder = self._dir(ticker, interval)
+        if not os.path.isdir(folder):
+            return []
+        names = sorted(n for n in os.listdir(folder) if n.endswith('.feather'))
+        return [os.path.join(folder, n) for n in names]
+
+    def _read_files(self, paths, columns=None):
+        if not paths:
+            return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], tz=ET_TZ, name='Datetime'))
+        tables = [feather.read_table(p, columns=columns, memory_map=True) for p in paths]
+        df = pa.concat_tables(tables).to_pandas()
+        df = df.set_index('Datetime')
+        df.index = df.index.tz_convert(ET_TZ)
+        return df
+
+    def read(self, ticker, interval, start=None, end=None, days=None):
+        """
+        讀取緩存
+        :param days: 只讀取最近 days 個有數據的交易日
+        """
+        paths = self.partitions(ticker, interval)
+        if days is not None:
+            paths = paths[-days:]
+        if start is not None:
+            first = pd.Timestamp(start).strftime('%Y-%m-%d')
+            paths = [p for p in paths if os.path.basename(p)[:10] >= first]
+        if end is not None:
+            last = pd.Timestamp(end).strftime('%Y-%m-%d')
+            paths = [p for p in paths if os.path.basename(p)[:10] <= last]
+
+        df = self._read_files(paths)
+        if start is not None:
+            df = df[df.index >= as_et(start)]
+        if end is not None:
+            df = df[df.index <= as_et(end)]
+        return df
+
+    def first_day(self, ticker, interval):
+        """最早緩存的交易日 (YYYY-MM-DD)，沒有緩存時返回 None"""
+        paths = self.partitions(ticker, interval)
+        return os.path.basename(paths[0])[:10] if paths else None
+
+    def _coverage_path(self, ticker, interval):
+        return os.path.join(self._dir(ticker, interval), 'coverage.json')
+
+    def covered_from(self, ticker, interval):
+        """
+        緩存覆蓋的起始日 (YYYY-MM-DD): 完整下載請求的起始日與最早分區中較早者，沒有緩存時返回 None
+        起始日是假期或股票較晚上市時，最早分區會晚於請求的起始日，但不缺數據
+        """
+        first = self.first_day(ticker, interval)
+        if first is None:
+            return None
+        try:
+            with open(self._coverage_path(ticker, interval), encoding='utf-8') as fh:
+                return min(first, json.load(fh)['start'])
+        except (OSError, ValueError, KeyError):
+            return first
+
+    def mark_covered(self, ticker, interval, start):
+        """記錄完整下載請求的起始日 (YYYY-MM-DD)"""
+        path = self._coverage_path(ticker, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as fh:
+            json.dump({'start': start}, fh)
+        os.replace(path + '.tmp', path)
+
+    def last_timestamp(self, ticker, interval):
+        """最後一根已緩存K線的時間，沒有緩存時返回 None"""
+        paths = self.partitions(ticker, interval)
+        if not paths:
+            return None
+        index = self._read_files(paths[-1:], columns=['Datetime']).index
+        return index[-1] if len(index) else None
+
+    def write(self, ticker, interval, df):
+        """按交易日寫入，與已有分區合併並去重 (同一時間保留新數據)"""
+        if df is None or df.empty:
+            return
+        folder = self._dir(ticker, interval)
+        os.makedirs(folder, exist_ok=True)
+
+        df = df[OHLCV_COLUMNS]
+        df.index = df.index.tz_convert(ET_TZ)
+        df.index.name = 'Datetime'
+        for day, part in df.groupby(df.index.strftime('%Y-%m-%d')):
+            path = os.path.join(folder, f"{day}.feather")
+            if os.path.exists(path):
+                part = pd.concat([self._read_files([path]), part])
+                part = part[~part.index.duplicated(keep='last')]
+            part = part.sort_index()
+
+            table = pa.Table.from_pandas(part.reset_index(), preserve_index=False)
+            tmp_path = path + '.tmp'
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+
+    def _unavailable_path(self):
+        return os.path.join(self.root, 'unavailable.json')
+
+    def _load_unavailable(self):
+        try:
+            with open(self._unavailable_path(), encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def unavailable(self, interval):
+        """仍在有效期內、標記為沒有 interval 數據的股票"""
+        now = pd.Timestamp.now(tz=ET_TZ)
+        marks = self._load_unavailable().get(interval, {})
+        return {t for t, expires in marks.items() if pd.Timestamp(expires) > now}
+
+    def mark_unavailable(self, tickers, interval, ttl=NEGATIVE_TTL):
+        """記錄下載不到數據的股票，同時清理已過期的記錄"""
+        if not tickers:
+            return
+        now = pd.Timestamp.now(tz=ET_TZ)
+        marks = self._load_unavailable()
+        for key in list(marks):
+            marks[key] = {t: e for t, e in marks[key].items() if pd.Timestamp(e) > now}
+        expires = (now + ttl).isoformat()
+        marks.setdefault(interval, {}).update({t.upper(): expires for t in tickers})
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._unavailable_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(marks, fh, indent=1)
+        os.replace(tmp_path, self._unavailable_path())
+
+
+def update_watchlist(tickers, interval='1m', days=5, store=None, prepost=True):
+    """
+    補齊觀察名單的緩存，只向 Yahoo 請求最後緩存K線之後的數據
+    沒有緩存或緩存過舊的股票從最近 days 個工作日的第一天起完整下載；完整下載仍無數據的股票在 NEGATIVE_TTL 內直接跳過
+    """
+    store = store or BarStore()
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    now = pd.Timestamp.now(tz=ET_TZ)
+    step = _interval_delta(interval)
+
+    skipped = store.unavailable(interval)
+    if skipped & set(tickers):
+        print(f"跳過近期沒有 {interval} 數據的股票: {', '.join(t for t in tickers if t in skipped)}")
+
+    first_day = _window_start(interval, days, now)
+    full, top_up = [], defaultdict(list)
+    for ticker in tickers:
+        if ticker in skipped:
+            continue
+        last = store.last_timestamp(ticker, interval)
+        if (last is None or now - last > pd.Timedelta(days=days + 3)
+                or store.covered_from(ticker, interval) > first_day):
+            # 沒有緩存、緩存過舊，或緩存的起始日晚於請求範圍 (之前以較少的 days 緩存): 完整下載
+            full.append(ticker)
+        elif step is None or now - last >= step:
+            # 從最後一根開始重取，覆蓋當時未完成的K線；按日期分組合併請求
+            top_up[last.normalize()].append((ticker, last))
+
+    if full:
+        # 用與上面檢查相同的起始日 (工作日)，而不是按日曆天數計算的 period
+        frames, missing, _ = download_watchlist(full, interval=interval, start=first_day,
+                                                prepost=prepost)
+        for ticker, df in frames.items():
+            store.write(ticker, interval, df)
+            store.mark_covered(ticker, interval, first_day)
+        # 只記錄請求成功但沒有數據的股票；失敗的 (網絡錯誤、限流) 下次重試
+        store.mark_unavailable(missing, interval)
+
+    for group in top_up.values():
+        start = min(last for _, last in group)
+        frames, _, _ = download_watchlist([t for t, _ in group], interval=interval,
+                                       start=start, prepost=prepost)
+        for ticker, df in frames.items():
+            store.write(ticker, interval, df)
+
+
+def load_watchlist(tickers, interval='1m', days=5, store=None, prepost=True):
+    """
+    從緩存讀取觀察名單最近 days 個交易日的K線 (先按 update_watchlist 補齊緩存)
+    大量股票時可用 compact_bars.load_universe 以緊湊格式讀取
+    :return: ({ticker: OHLCV DataFrame}, 沒有數據的股票列表)
+    """
+    store = store or BarStore()
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    update_watchlist(tickers, interval=interval, days=days, store=store, prepost=prepost)
+
+    frames = {}
+    for ticker in tickers:
+        df = store.read(ticker, interval, days=days)
+        if not df.empty:
+            frames[ticker] = df
+    return frames, [t for t in tickers if t not in frames]
+
+
+def get_cached_ohlcv(ticker, period='5d', interval='1m', start=None, store=None):
+    """
+    單一股票的緩存讀取
+    :param period: 'Nd' 格式走緩存 (最近 N 個交易日)，其他格式直接下載
+    :param start: 提供時讀取 start 之後的全部緩存
+    """
+    days = period_days(period)
+    if start is not None:
+        # 與 update_watchlist 一樣按工作日計算
+        days = max(len(pd.bdate_range(as_et(start).date(), pd.Timestamp.now(tz=ET_TZ).date())), 1)
+    if days is None:
+        return get_ohlcv(ticker, period=period, interval=interval)
+
+    store = store or BarStore()
+    frames, _ = load_watchlist([ticker], interval=interval, days=days, store=store)
+    df = frames.get(ticker.upper(), pd.DataFrame(columns=OHLCV_COLUMNS))
+    if start is not None and not df.empty:
+        df = df[df.index >= as_et(start)]
+    return df
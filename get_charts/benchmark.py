@@ -0,0 +1,170 @@
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import synthetic_ohlcv
+from sr_analyzer import METHODS, PROFILES, FeatureCache, SupportResistanceAnalyzer
+from levels import merge_levels
+
+# 數據規模: 名稱 -> 1 分鐘K線的交易日數 (含盤前盤後)
+SIZES = {'1d': 1, '5d': 5, '20d': 20, '60d': 60}
+RESULTS_PATH = os.environ.get('BENCHMARK_RESULTS') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'results.csv')
+# 中位數耗時比上次慢超過此倍數時標記為退化
+REGRESSION_RATIO = 1.3
+# 每個用例最少 / 最多重複次數，及重複的總時間上限 (秒)
+MIN_REPEAT, MAX_REPEAT, TIME_BUDGET = 3, 20, 1.0
+
+
+def measure(func):
+    """先運行一次預熱，再重複計時；返回 (次數, 最短秒數, 中位秒數)"""
+    func()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MIN_REPEAT or (len(timings) < MAX_REPEAT
+                                        and time.perf_counter() - started < TIME_BUDGET):
+        began = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - began)
+    return len(timings), min(timings), statistics.median(timings)
+
+
+def method_cases():
+    """每個分析方法在各 profile 中出現的不同參數組合各一個用例"""
+    cases, seen = {}, set()
+    for profile, methods in PROFILES.items():
+        for name, params in methods.items():
+            key = (name, repr(sorted(params.items())))
+            if key not in seen:
+                seen.add(key)
+                cases[f"method:{name}:{profile}"] = (name, params)
+    return cases
+
+
+def build_cases(df):
+    """
+    用例名稱 -> 工廠函數；工廠做準備工作 (分析、生成水平等) 並返回計時用的無參數函數，
+    只有通過篩選的用例才會調用工廠；每次計時調用都重新計算 (不使用上一次的緩存)
+    """
+    cases = {}
+    for case, (name, params) in method_cases().items():
+        func = METHODS[name]['func']
+        cases[case] = lambda func=func, params=params: lambda: func(FeatureCache(df), **params)
+
+    def analyzed(profile):
+        analyzer = SupportResistanceAnalyzer(df, profile=profile)
+        analyzer.run_all_analysis()
+        return analyzer
+
+    for profile in PROFILES:
+        cases[f"run_all_analysis:{profile}"] = lambda profile=profile: (
+            lambda: SupportResistanceAnalyzer(df, profile=profile).run_all_analysis())
+        cases[f"get_all_levels:{profile}"] = lambda profile=profile: analyzed(profile).get_all_levels
+
+    # 大量水平的合併 (數量隨K線數增長)
+    levels = df['close'].to_numpy()[::10]
+    cases['merge_levels:mean'] = lambda: lambda: merge_levels(levels, 0.02, anchor='mean')
+    cases['merge_levels:gap'] = lambda: lambda: merge_levels(levels, 0.02, anchor='gap')
+
+    # 圖表構建 (不寫文件)
+    def chart(kind):
+        from get_yf_sr_multi_plot_split import create_base_chart, create_layered_chart
+        from chart_payload import compact_figure
+        if kind == 'base':
+            return lambda: create_base_chart(df, 'Benchmark')
+        results = analyzed('split').results
+        if kind == 'layered':
+            return lambda: create_layered_chart(df, results, active='All')
+        return lambda: compact_figure(create_layered_chart(df, results, active='All')).to_json()
+
+    for kind in ('base', 'layered', 'compact_json'):
+        cases[f"chart:{kind}"] = lambda kind=kind: chart(kind)
+    return cases
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmarks(sizes=None, filters=None, seed=0):
+    """
+    :param sizes: SIZES 的名稱列表，None 為全部
+    :param filters: 只運行名稱包含其中任一字串的用例
+    :return: 每個 (用例, 規模) 一行的 DataFrame
+    """
+    sizes = sizes or list(SIZES)
+    run_at = pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+    commit = _commit()
+    rows = []
+    for size in sizes:
+        df = synthetic_ohlcv(SIZES[size], seed=seed)
+        for case, factory in build_cases(df).items():
+            if filters and not any(f in case for f in filters):
+                continue
+            try:
+                repeat, best, median = measure(factory())
+                status, error = 'ok', None
+            except Exception as e:
+                repeat, best, median, status, error = 0, np.nan, np.nan, 'error', str(e)
+            rows.append({'run_at': run_at, 'commit': commit, 'machine': platform.node(),
+                         'python': platform.python_version(), 'case': case, 'size': size,
+                         'bars': len(df), 'repeat': repeat, 'min_s': best, 'median_s': median,
+                         'status': status, 'error': error})
+            print(f"{size:>4} {case:<45} {median * 1000:10.2f} ms" if status == 'ok'
+                  else f"{size:>4} {case:<45} 失敗: {error}")
+    return pd.DataFrame(rows)
+
+
+def compare(results, history):
+    """與同一台機器上一次運行的中位耗時比較，ratio > REGRESSION_RATIO 標記為退化"""
+    results = results.copy()
+    previous = history[(history['machine'] == results['machine'].iloc[0])
+                       & (history['run_at'] < results['run_at'].iloc[0])
+                       & (history['status'] == 'ok')]
+    results['previous_s'] = np.nan
+    if not previous.empty:
+        last = previous.sort_values('run_at').groupby(['case', 'size']).tail(1)
+        lookup = last.set_index(['case', 'size'])['median_s']
+        results['previous_s'] = [lookup.get((c, s), np.nan) for c, s in zip(results['case'], results['size'])]
+    results['ratio'] = results['median_s'] / results['previous_s']
+    results['regression'] = results['ratio'] > REGRESSION_RATIO
+    return results
+
+
+def save_results(results, path=RESULTS_PATH):
+    """追加到歷史結果 CSV，返回追加前的歷史記錄"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    history = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame(columns=results.columns)
+    results.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+    return history
+
+
+if __name__ == "__main__":
+    # 用法: python benchmark.py [1d 5d 20d 60d] [用例名稱片段...] [--check]
+    # 完全離線 (合成數據)，結果追加到 benchmarks/results.csv 並與上一次運行比較；--check 時有退化則返回 1
+    args = [a for a in sys.argv[1:] if a != '--check']
+    sizes = [a for a in args if a in SIZES] or None
+    filters = [a for a in args if a not in SIZES] or None
+
+    started = time.perf_counter()
+    results = run_benchmarks(sizes, filters)
+    history = save_results(results)
+    report = compare(results, history)
+
+    slower = report[report['regression']]
+    if not slower.empty:
+        print(f"\n⚠️ 比上次慢 {REGRESSION_RATIO} 倍以上:")
+        print(slower[['case', 'size', 'previous_s', 'median_s', 'ratio']].round(4).to_string(index=False))
+    print(f"\n共 {len(report)} 個用例，耗時 {time.perf_counter() - started:.1f} 秒，結果已追加到 {os.path.abspath(RESULTS_PATH)}")
+    if '--check' in sys.argv and not slower.empty:
+        sys.exit(1)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# 圖表最多繪製的K線數 (約等於圖表寬度的像素數)
+MAX_CHART_BARS = 1500
+
+
+def _visible(df, start=None, end=None):
+    """按可見範圍截取，無時區的邊界視為與索引同一時區"""
+    tz = df.index.tz
+    if start is not None:
+        start = pd.Timestamp(start)
+        if start.tzinfo is None and tz is not None:
+            start = start.tz_localize(tz)
+        df = df[df.index >= start]
+    if end is not None:
+        end = pd.Timestamp(end)
+        if end.tzinfo is None and tz is not None:
+            end = end.tz_localize(tz)
+        df = df[df.index <= end]
+    return df
+
+
+def bucket_starts(index, step):
+    """
+    每 step 根K線一組的起始位置；每個交易日重新起算，聚合後的K線不會跨越隔夜缺口
+    """
+    n = len(index)
+    positions = np.arange(n)
+    days = index.normalize().asi8
+    new_day = np.r_[True, days[1:] != days[:-1]]
+    day_start = np.maximum.accumulate(np.where(new_day, positions, 0))
+    return np.flatnonzero((positions - day_start) % step == 0)
+
+
+def decimate_ohlcv(df, max_bars=MAX_CHART_BARS, start=None, end=None):
+    """
+    把K線重新聚合到約 max_bars 根: 開盤取首根、最高/最低取極值、收盤取末根、成交量加總
+    每組的時間為組內第一根K線的時間
+    :param start/end: 只處理可見範圍內的K線
+    :return: 相同欄位的 DataFrame；K線數不超過 max_bars 時原樣返回
+    """
+    df = _visible(df, start, end)
+    n = len(df)
+    if not max_bars or n <= max_bars:
+        return df
+
+    step = -(-n // max_bars)
+    starts = bucket_starts(df.index, step)
+    ends = np.r_[starts[1:], n] - 1
+
+    volume = df['volume'].to_numpy()
+    out = pd.DataFrame({
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        # uint32 成交量 (compact_bars) 按 int64 累加，避免溢出
+        'volume': np.add.reduceat(volume, starts, dtype=np.result_type(volume.dtype, np.int64)),
+    }, index=df.index[starts])
+    out.index.name = df.index.name
+    return out
+
+
+def candle_colors(df, up='lime', down='red'):
+    """成交量柱顏色: 收盤不低於開盤為 up"""
+    return np.where(df['close'].to_numpy() >= df['open'].to_numpy(), up, down)
+
+
+def enable_zoom_refinement(fig, df, max_bars=MAX_CHART_BARS, candle_trace=0, volume_trace=1,
+                           up='lime', down='red'):
+    """
+    轉為 FigureWidget (Jupyter)，縮放時按可見範圍重新聚合K線；範圍內K線不超過 max_bars 時顯示原始精度
+    :param candle_trace/volume_trace: K線與成交量 trace 在 fig.data 中的位置
+    :return: FigureWidget；環境不支援 (未安裝 ipywidgets 等) 時返回原圖
+    """
+    try:
+        widget = go.FigureWidget(fig)
+    except Exception as e:
+        print(f"無法啟用縮放重取: {str(e)}")
+        return fig
+
+    def on_range(layout, xrange):
+        start, end = xrange if xrange else (None, None)
+        part = decimate_ohlcv(df, max_bars, start, end)
+        with widget.batch_update():
+            candle = widget.data[candle_trace]
+            candle.x, candle.open, candle.high = part.index, part['open'], part['high']
+            candle.low, candle.close = part['low'], part['close']
+            if volume_trace is not None:
+                bar = widget.data[volume_trace]
+                bar.x, bar.y = part.index, part['volume']
+                bar.marker.color = candle_colors(part, up, down)
+
+    widget.layout.xaxis.on_change(on_range, 'range')
+    return widget
@@ -0,0 +1,184 @@
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from sr_analyzer import SupportResistanceAnalyzer
+from sr_batch import normalize_tickers, load_frames
+from get_yf_sr_multi_plot_split import create_layered_chart, layer_figures
+from chart_payload import compact_figure
+
+EXPORT_FORMATS = ('png', 'svg', 'html')
+EXPORT_COLUMNS = ['ticker', 'view', 'format', 'path', 'seconds', 'status', 'error']
+# HTML 共用的 plotly.js 文件名 (與 HTML 放在同一目錄)
+PLOTLYJS_NAME = 'plotly.min.js'
+
+
+def _init_worker():
+    """每個工作進程啟動一個常駐的 kaleido 渲染器，之後所有圖片共用"""
+    try:
+        import kaleido
+        if hasattr(kaleido, 'start_sync_server'):
+            # 先試渲染一張空圖: 找不到 Chrome 時常駐渲染器的線程會直接退出，之後的請求會一直等待
+            pio.to_image(go.Figure(), format='png', width=10, height=10)
+            kaleido.start_sync_server(silence_warnings=True)
+    except Exception as e:
+        print(f"kaleido 渲染器啟動失敗: {str(e)}")
+
+
+def _terminate(pool):
+    """
+    超時時的關閉: shutdown 只會取消排隊中的任務，仍在渲染的工作進程會一直運行到完成
+    (解釋器退出時還會等待它們)，所以直接終止工作進程
+    """
+    if hasattr(pool, 'terminate_workers'):
+        # Python 3.14+
+        pool.terminate_workers()
+        return
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _file_name(ticker, view):
+    return f"{ticker}_{re.sub(r'[^A-Za-z0-9]+', '_', view).strip('_')}"
+
+
+def _write_images(figs, paths, width, height):
+    """同一批圖片一次交給渲染器；舊版 plotly 沒有 write_images 時逐張寫入"""
+    if hasattr(pio, 'write_images'):
+        pio.write_images(figs, paths, width=width, height=height)
+    else:
+        for fig, path in zip(figs, paths):
+            pio.write_image(fig, path, width=width, height=height)
+
+
+def _export_ticker(ticker, df, out_dir, formats, profile, max_supports, width, height, compact=True):
+    """分析並導出一隻股票的所有圖層，返回每個文件一條記錄"""
+    records = []
+    start = time.perf_counter()
+    try:
+        results = SupportResistanceAnalyzer(df, profile=profile).run_all_analysis()
+        if 'Error' in results:
+            raise ValueError(results['Error'])
+        fig = create_layered_chart(df, results, max_supports=max_supports, active='All')
+        if compact:
+            compact_figure(fig)
+    except Exception as e:
+        return [{'ticker': ticker, 'view': None, 'format': None, 'path': None,
+                 'seconds': time.perf_counter() - start, 'status': 'error', 'error': str(e)}]
+
+    if 'html' in formats:
+        path = os.path.join(out_dir, f"{ticker}.html")
+        began = time.perf_counter()
+        try:
+            fig.write_html(path, include_plotlyjs=PLOTLYJS_NAME)
+            status, error = 'ok', None
+        except Exception as e:
+            status, error = 'error', str(e)
+        records.append({'ticker': ticker, 'view': 'All', 'format': 'html', 'path': path,
+                        'seconds': time.perf_counter() - began, 'status': status, 'error': error})
+
+    image_formats = [f for f in formats if f != 'html']
+    if image_formats:
+        views = layer_figures(fig)
+        figs, paths, keys = [], [], []
+        for view, view_fig in views:
+            for fmt in image_formats:
+                figs.append(view_fig)
+                paths.append(os.path.join(out_dir, f"{_file_name(ticker, view)}.{fmt}"))
+                keys.append((view, fmt))
+
+        began = time.perf_counter()
+        try:
+            _write_images(figs, paths, width, height)
+            status, error = 'ok', None
+        except Exception as e:
+            status, error = 'error', str(e)
+        seconds = (time.perf_counter() - began) / len(figs)
+        records.extend({'ticker': ticker, 'view': view, 'format': fmt, 'path': path,
+                        'seconds': seconds, 'status': status, 'error': error}
+                       for (view, fmt), path in zip(keys, paths))
+    return records
+
+
+def export_charts(tickers, out_dir=None, period='5d', interval='1m', profile='split',
+                  formats=EXPORT_FORMATS, max_supports=5, width=1600, height=800,
+                  frames=None, max_workers=None, timeout=None, compact=True):
+    """
+    批量導出觀察名單的圖表 (無需瀏覽器，適合無頭環境)
+    :param tickers: 見 sr_batch.normalize_tickers
+    :param out_dir: 輸出目錄，預設 charts/YYYYMMDD
+    :param formats: png / svg / html 的任意組合；圖片每個方法圖層一張，HTML 每隻股票一個分層圖表
+    :param timeout: 整批的最長秒數，超時未完成的股票標記為 timeout，仍在執行的工作進程會被終止
+    :param compact: 圖表數據使用 float32 / epoch 毫秒的 base64 類型數組 (見 chart_payload)
+    :return: 每個文件一行的 DataFrame (EXPORT_COLUMNS)，清單同時保存為 out_dir/index.csv
+    """
+    tickers = normalize_tickers(tickers)
+    formats = [f.lower() for f in formats]
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unsupported formats: {', '.join(sorted(unknown))}")
+
+    out_dir = out_dir or os.path.join('charts', time.strftime('%Y%m%d'))
+    os.makedirs(out_dir, exist_ok=True)
+    if 'html' in formats:
+        # 所有 HTML 引用同一份 plotly.js，而不是每個文件內嵌 3MB+
+        with open(os.path.join(out_dir, PLOTLYJS_NAME), 'w', encoding='utf-8') as fh:
+            fh.write(get_plotlyjs())
+
+    if frames is None:
+        frames = load_frames(tickers, period=period, interval=interval)
+
+    records = [{'ticker': t, 'view': None, 'format': None, 'path': None, 'seconds': 0.0,
+                'status': 'no data', 'error': None} for t in tickers if t not in frames]
+    items = [(t, frames[t]) for t in tickers if t in frames]
+    if items:
+        max_workers = max_workers or min(len(items), os.cpu_count() or 1)
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+        futures = {pool.submit(_export_ticker, ticker, df, out_dir, formats, profile,
+                               max_supports, width, height, compact): ticker
+                   for ticker, df in items}
+        done, pending = wait(futures, timeout=timeout)
+        for future in done:
+            try:
+                records.extend(future.result())
+            except Exception as e:
+                records.append({'ticker': futures[future], 'view': None, 'format': None, 'path': None,
+                                'seconds': None, 'status': 'error', 'error': str(e)})
+        for future in pending:
+            records.append({'ticker': futures[future], 'view': None, 'format': None, 'path': None,
+                            'seconds': None, 'status': 'timeout', 'error': None})
+        if pending:
+            _terminate(pool)
+        else:
+            pool.shutdown()
+
+    order = {t: i for i, t in enumerate(tickers)}
+    manifest = pd.DataFrame(records, columns=EXPORT_COLUMNS)
+    manifest = manifest.sort_values('ticker', key=lambda s: s.map(order), kind='stable')
+    manifest = manifest.reset_index(drop=True)
+    manifest.to_csv(os.path.join(out_dir, 'index.csv'), index=False)
+    return manifest
+
+
+if __name__ == "__main__":
+    # 用法: python chart_export.py [代碼... | watchlist.csv]
+    WATCHLIST = sys.argv[1:] or ['icct', 'mspr', 'bjdx', 'aapl']
+    if len(WATCHLIST) == 1 and os.path.isfile(WATCHLIST[0]):
+        WATCHLIST = WATCHLIST[0]
+
+    started = time.perf_counter()
+    manifest = export_charts(WATCHLIST, period='5d', interval='1m', profile='split',
+                             formats=('png', 'html'), timeout=15 * 60)
+    print(manifest.groupby(['ticker', 'status'], sort=False).size().to_string())
+    print(f"\n共導出 {(manifest['status'] == 'ok').sum()} 個文件，耗時 {time.perf_counter() - started:.1f} 秒")
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+ET_TZ = 'America/New_York'
+
+# 盤前 / 盤後時段 (美東時間)
+PRE_MARKET = ('04:00:00', '09:30:00')
+POST_MARKET = ('16:00:00', '20:00:00')
+
+
+def _axis_refs(row):
+    suffix = '' if row == 1 else str(row)
+    return f'x{suffix}', f'y{suffix}'
+
+
+class ChartOverlays:
+    """
+    收集圖表上的時間線、時段背景、水平線與標註 (純 dict)，最後以一次 update_layout 寫入
+    避免逐條 add_shape / add_annotation 時 Plotly 每次都驗證並複製整個 layout
+    """
+
+    def __init__(self):
+        self.shapes = []
+        self.annotations = []
+
+    def hline(self, y, x0, x1, color, width=1.5, dash='solid', opacity=None, row=1):
+        """第 row 個子圖上從 x0 到 x1 的水平線"""
+        xref, yref = _axis_refs(row)
+        shape = dict(type='line', x0=x0, y0=y, x1=x1, y1=y, xref=xref, yref=yref,
+                     line=dict(color=color, width=width, dash=dash))
+        if opacity is not None:
+            shape['opacity'] = opacity
+        self.shapes.append(shape)
+
+    def label(self, x, y, text, color, size=10, xanchor='left', row=1):
+        xref, yref = _axis_refs(row)
+        self.annotations.append(dict(x=x, y=y, xref=xref, yref=yref, text=text, showarrow=False,
+                                     xanchor=xanchor, font=dict(color=color, size=size)))
+
+    def level(self, y, x0, x1, text, color, width=1.5, dash='solid', opacity=None,
+              size=10, xanchor='left', row=1):
+        """支撐阻力水平線加右側標註"""
+        self.hline(y, x0, x1, color, width=width, dash=dash, opacity=opacity, row=row)
+        self.label(x1, y, text, color, size=size, xanchor=xanchor, row=row)
+
+    def time_gridlines(self, times, minutes=(0,), color='white', width=0.5, dash='dot',
+                       skip_ends=True):
+        """
+        在分鐘數屬於 minutes 的K線上畫貫穿整個圖表的垂直虛線
+        :param minutes: (0,) 為整點，(30,) 為半點
+        :param skip_ends: 不在第一根和最後一根K線上畫線
+        """
+        times = pd.DatetimeIndex(times)
+        mask = np.isin(times.minute, minutes)
+        if skip_ends and len(mask):
+            mask[0] = mask[-1] = False
+        line = dict(color=color, width=width, dash=dash)
+        self.shapes.extend(dict(type='line', x0=t, y0=0, x1=t, y1=1, xref='x', yref='paper', line=line)
+                           for t in times[mask])
+
+    def session_bands(self, times, opacity=0.2, rows=1, pre_color='yellow', post_color='navy'):
+        """每個交易日的盤前、盤後背景色，覆蓋 rows 個子圖"""
+        dates = pd.DatetimeIndex(times).strftime('%Y-%m-%d').unique()
+        for date in dates:
+            for (start, end), color in ((PRE_MARKET, pre_color), (POST_MARKET, post_color)):
+                x0 = pd.Timestamp(f"{date} {start}").tz_localize(ET_TZ)
+                x1 = pd.Timestamp(f"{date} {end}").tz_localize(ET_TZ)
+                for row in range(1, rows + 1):
+                    xref, yref = _axis_refs(row)
+                    self.shapes.append(dict(type='rect', x0=x0, x1=x1, y0=0, y1=1,
+                                            xref=xref, yref=f'{yref} domain',
+                                            fillcolor=color, opacity=opacity,
+                                            layer='below', line=dict(width=0)))
+
+    def apply(self, fig):
+        """與圖表已有的 shapes / annotations 合併後一次寫入"""
+        fig.update_layout(shapes=list(fig.layout.shapes) + self.shapes,
+                          annotations=list(fig.layout.annotations) + self.annotations)
+        return fig
@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+# 數值數組 (K線、成交量、指標線) 寫入圖表時使用的類型
+PAYLOAD_DTYPE = np.float32
+NUMERIC_ATTRS = ('open', 'high', 'low', 'close', 'y')
+
+
+def wall_clock_ms(values):
+    """
+    時間轉為 epoch 毫秒 (float64)，按牆上時間計算
+    Plotly 顯示帶時區的時間時本來就忽略時區，這樣數值軸與原來的 ISO 字串顯示相同的美東時間
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(values, dtype=object)))
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.as_unit('ms').asi8.astype(np.float64)
+
+
+def _is_datetime(values):
+    if values is None or len(values) == 0:
+        return False
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return True
+    return values.dtype == object and isinstance(values[0], (pd.Timestamp, np.datetime64))
+
+
+def _compact_colors(trace):
+    """只有兩種顏色的 marker.color 字串數組 (如成交量紅綠柱) 改為 0/1 編碼加兩色 colorscale"""
+    marker = getattr(trace, 'marker', None)
+    if marker is None or marker.color is None or isinstance(marker.color, str):
+        return
+    colors = np.asarray(marker.color, dtype=object)
+    palette = list(dict.fromkeys(colors))
+    if len(palette) != 2 or not all(isinstance(c, str) for c in palette):
+        return
+    codes = (colors == palette[1]).astype(np.uint8)
+    trace.marker.update(color=codes, colorscale=[[0, palette[0]], [1, palette[1]]],
+                        cmin=0, cmax=1, showscale=False)
+
+
+def compact_figure(fig, dtype=PAYLOAD_DTYPE):
+    """
+    把圖表數據改為緊湊格式 (原地修改):
+    時間軸改為 epoch 毫秒數值、價格與成交量改為 float32、兩色柱狀圖顏色改為 0/1 編碼，
+    Plotly 6+ 序列化時輸出 base64 類型數組 (bdata) 而不是逐個數字的 JSON 文本
+    """
+    for trace in fig.data:
+        if 'x' in trace and _is_datetime(trace.x):
+            trace.x = wall_clock_ms(trace.x)
+        for attr in NUMERIC_ATTRS:
+            if attr not in trace or trace[attr] is None:
+                continue
+            values = np.asarray(trace[attr])
+            if values.dtype.kind in 'fiu':
+                values = values.astype(dtype)
+            elif values.dtype == object and len(values) and not isinstance(values[0], str):
+                # pandas 可空類型轉出的 object 數組
+                values = pd.to_numeric(values, errors='coerce').astype(dtype)
+            else:
+                continue
+            # 先清空: 數值相同時 Plotly 會忽略賦值，保留原來的 float64
+            trace[attr] = None
+            trace[attr] = values
+        _compact_colors(trace)
+    # 數值 x 需要明確指定為日期軸，否則會被當作普通數字
+    fig.update_xaxes(type='date')
+    return fig
+
+
+def write_report(figs, path, title='Charts', include_plotlyjs=True):
+    """
+    多個圖表寫入同一個 HTML，plotly.js 只包含一次
+    :param figs: Figure 列表或 {標題: Figure}
+    :param include_plotlyjs: True 為內嵌一次，'cdn' 或 .js 路徑為外部引用
+    """
+    items = figs.items() if isinstance(figs, dict) else [(None, fig) for fig in figs]
+    if include_plotlyjs is True:
+        script = f"<script type=\"text/javascript\">{get_plotlyjs()}</script>"
+    elif include_plotlyjs == 'cdn':
+        # 必須與已安裝的 plotly 版本一致: plotly-latest 停留在 1.58，無法解碼 compact_figure 的 bdata
+        script = f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
+    else:
+        script = f'<script src="{include_plotlyjs}"></script>'
+
+    parts = []
+    for name, fig in items:
+        if name:
+            parts.append(f"<h3>{name}</h3>")
+        parts.append(pio.to_html(fig, full_html=False, include_plotlyjs=False))
+
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write(f"<html><head><meta charset=\"utf-8\"><title>{title}</title>{script}</head>"
+                 f"<body style=\"background:black;color:white\">{''.join(parts)}</body></html>")
+    return path
+
+
+def browser_load_ms(path):
+    """用無頭 Chrome (selenium) 打開 HTML，返回從導航開始到圖表繪製完成的毫秒數；沒有 Chrome 時返回 None"""
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        options = Options()
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+        driver = webdriver.Chrome(options=options)
+    except Exception as e:
+        print(f"無法啟動 Chrome，跳過瀏覽器加載測試: {str(e).splitlines()[0] if str(e) else e}")
+        return None
+    try:
+        # 圖表在頁面內的 script 中同步繪製，load 事件後即已完成
+        driver.get('file://' + os.path.abspath(path))
+        return driver.execute_script("return performance.now();")
+    finally:
+        driver.quit()
+
+
+def _benchmark_frame(days=14, seed=0):
+    """含盤前盤後的 1 分鐘隨機遊走K線 (每天 04:00-20:00)"""
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(f"{d:%Y-%m-%d} 04:00", f"{d:%Y-%m-%d} 19:59", freq='1min').values
+        for d in sessions])).tz_localize('America/New_York')
+    n = len(index)
+    close = np.abs(1.5 + np.cumsum(rng.normal(0, 0.004, n))) + 0.05
+    open_ = np.r_[close[0], close[:-1]]
+    spread = rng.random(n) * 0.01
+    df = pd.DataFrame({'open': open_, 'high': np.maximum(open_, close) + spread,
+                       'low': np.minimum(open_, close) - spread, 'close': close,
+                       'volume': rng.integers(100, 200000, n).astype(float)}, index=index)
+    df.index.name = 'Datetime'
+    return df
+
+
+if __name__ == "__main__":
+    # 用法: python chart_payload.py [輸出目錄]
+    # 比較原始輸出與緊湊輸出的 HTML 大小及瀏覽器加載時間 (14 天 1 分鐘，不聚合)
+    from get_yf_sr_multi_plot_split import create_base_chart
+
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else 'payload_benchmark'
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'plotly.min.js'), 'w', encoding='utf-8') as fh:
+        fh.write(get_plotlyjs())
+
+    df = _benchmark_frame()
+    print(f"{len(df)} 根 1 分鐘K線")
+    rows = []
+    for mode in ('json', 'compact'):
+        fig = create_base_chart(df, f"Payload benchmark ({mode})", max_bars=None)
+        started = time.perf_counter()
+        if mode == 'compact':
+            compact_figure(fig)
+        path = os.path.join(out_dir, f"{mode}.html")
+        fig.write_html(path, include_plotlyjs='plotly.min.js')
+        build = time.perf_counter() - started
+        rows.append({'mode': mode, 'size_mb': os.path.getsize(path) / 1e6,
+                     'write_s': build, 'load_ms': browser_load_ms(path)})
+
+    report = pd.DataFrame(rows).set_index('mode')
+    print(report.round(3).to_string())
+    ratio = report.loc['json', 'size_mb'] / report.loc['compact', 'size_mb']
+    print(f"\n緊湊輸出大小為原來的 1/{ratio:.1f} (plotly.js 另計 {len(get_plotlyjs()) / 1e6:.1f} MB，共用一份)")
@@ -0,0 +1,140 @@
+import numpy as np
+
+# 自動選擇聚類數時的預設範圍
+K_RANGE = (2, 5)
+
+
+def _prefix_sums(x, w):
+    """加權前綴和；x 先減去加權均值，減少平方和相減時的誤差"""
+    x = x - np.average(x, weights=w)
+    zero = np.zeros(1)
+    return (np.concatenate([zero, np.cumsum(w)]),
+            np.concatenate([zero, np.cumsum(w * x)]),
+            np.concatenate([zero, np.cumsum(w * x * x)]))
+
+
+def _cluster_cost(sums, j, i):
+    """已排序數據 [j, i] (含) 作為一個聚類的加權平方誤差"""
+    W, S1, S2 = sums
+    w = W[i + 1] - W[j]
+    s = S1[i + 1] - S1[j]
+    cost = (S2[i + 1] - S2[j]) - s * s / np.where(w > 0, w, 1.0)
+    return np.maximum(cost, 0.0)
+
+
+def _fill_layer(sums, prev, m, n):
+    """
+    計算第 m 層 (m+1 個聚類): D[i] = min_j prev[j-1] + cost(j, i)
+    最優 j 隨 i 單調不減，按分治法求解；同一遞歸深度的所有子問題一起向量化計算
+    """
+    cost = np.full(n, np.inf)
+    start = np.zeros(n, dtype=np.int64)
+    lo = np.array([m]); hi = np.array([n - 1])
+    olo = np.array([m]); ohi = np.array([n - 1])
+
+    while len(lo):
+        mid = (lo + hi) // 2
+        top = np.minimum(mid, ohi)
+        lengths = top - olo + 1
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        owner = np.repeat(np.arange(len(lo)), lengths)
+        j = olo[owner] + (np.arange(lengths.sum()) - offsets[owner])
+
+        values = prev[j - 1] + _cluster_cost(sums, j, mid[owner])
+        best_values = np.minimum.reduceat(values, offsets)
+        hits = np.flatnonzero(values == best_values[owner])
+        _, first = np.unique(owner[hits], return_index=True)
+        best = j[hits[first]]
+
+        cost[mid] = best_values
+        start[mid] = best
+
+        left = lo <= mid - 1
+        right = mid + 1 <= hi
+        lo, hi, olo, ohi = (np.concatenate([lo[left], mid[right] + 1]),
+                            np.concatenate([mid[left] - 1, hi[right]]),
+                            np.concatenate([olo[left], best[right]]),
+                            np.concatenate([best[left], ohi[right]]))
+    return cost, start
+
+
+def _dp_tables(x, w, k_max):
+    """所有 1..k_max 個聚類的最優代價 (cost[m][i]) 與最後一個聚類的起點 (start[m][i])"""
+    n = len(x)
+    sums = _prefix_sums(x, w)
+    cost = np.empty((k_max, n))
+    start = np.zeros((k_max, n), dtype=np.int64)
+    cost[0] = _cluster_cost(sums, np.zeros(n, dtype=np.int64), np.arange(n))
+    for m in range(1, k_max):
+        cost[m], start[m] = _fill_layer(sums, cost[m - 1], m, n)
+    return cost, start
+
+
+def _backtrack(start, k, n):
+    """返回 k 個聚類在已排序數據中的起點"""
+    starts = np.empty(k, dtype=np.int64)
+    i = n - 1
+    for m in range(k - 1, -1, -1):
+        starts[m] = start[m][i]
+        i = starts[m] - 1
+    return starts
+
+
+def _bic(x, w, starts):
+    """把每個聚類視為一個正態分量的加權 BIC (Ckmeans.1d.dp 的做法)"""
+    total = w.sum()
+    bounds = np.r_[starts, len(x)]
+    loglik = 0.0
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        cw = w[a:b].sum()
+        mean = np.average(x[a:b], weights=w[a:b])
+        var = np.average((x[a:b] - mean) ** 2, weights=w[a:b])
+        var = max(var, 1e-12 * max(1.0, mean * mean))
+        loglik += (cw * np.log(cw / total) - 0.5 * cw * np.log(2 * np.pi * var)
+                   - 0.5 * np.sum(w[a:b] * (x[a:b] - mean) ** 2) / var)
+    k = len(starts)
+    return -2 * loglik + (3 * k - 1) * np.log(total)
+
+
+def ckmeans(x, k=None, weights=None, k_range=K_RANGE):
+    """
+    一維最優 k-means (Ckmeans.1d.dp): 排序後動態規劃，結果為全局最優且每次相同
+    :param k: 聚類數；None 時在 k_range 內按 BIC 自動選擇
+    :param weights: 每個點的權重 (如成交量)，None 為等權
+    :return: (按升序排列的聚類中心, 每個原始數據點所屬聚類的序號)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    w = np.ones_like(x) if weights is None else np.asarray(weights, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(w) & (w > 0)
+    if not valid.any():
+        raise ValueError("No valid data for clustering")
+
+    order = np.flatnonzero(valid)[np.argsort(x[valid], kind='stable')]
+    xs, ws = x[order], w[order]
+    n = len(xs)
+    n_unique = len(np.unique(xs))
+
+    if k is None:
+        k_min, k_max = k_range
+        k_max = max(1, min(k_max, n_unique))
+        k_min = max(1, min(k_min, k_max))
+    else:
+        if k > n_unique:
+            raise ValueError(f"Cannot form {k} clusters from {n_unique} distinct values")
+        k_min = k_max = k
+
+    cost, start = _dp_tables(xs, ws, k_max)
+    if k is None:
+        candidates = {kk: _backtrack(start, kk, n) for kk in range(k_min, k_max + 1)}
+        k = min(candidates, key=lambda kk: _bic(xs, ws, candidates[kk]))
+        starts = candidates[k]
+    else:
+        starts = _backtrack(start, k, n)
+
+    sorted_labels = np.repeat(np.arange(k), np.diff(np.r_[starts, n]))
+    centers = np.bincount(sorted_labels, weights=ws * xs, minlength=k) / \
+        np.bincount(sorted_labels, weights=ws, minlength=k)
+
+    labels = np.full(len(x), -1, dtype=np.int64)
+    labels[order] = sorted_labels
+    return centers, labels
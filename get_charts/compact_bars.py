@@ -0,0 +1,239 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from market_data import ET_TZ
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+COLUMNS = ('timestamp',) + PRICE_COLUMNS + ('volume',)
+# float32 約有 7 位有效數字；轉回 float64 時按 6 位有效數字取整，還原為原來的報價
+# (低價股 $0.0001 報價單位、$10000 以下的 $0.01 報價單位都不受影響)
+PRICE_DIGITS = 6
+UINT32_MAX = np.iinfo(np.uint32).max
+DTYPES = {'timestamp': np.int64, 'open': np.float32, 'high': np.float32, 'low': np.float32,
+          'close': np.float32, 'volume': np.uint32}
+INDEX_DTYPE = pd.DatetimeTZDtype('ns', ET_TZ)
+
+
+def to_float64(values):
+    """
+    分析用的 float64 陣列；float32 價格按 PRICE_DIGITS 位有效數字還原，
+    使緊湊K線的分析結果與 float64 DataFrame 相同
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return np.asarray(values, dtype=np.float64)
+    out = values.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        scale = 10.0 ** (PRICE_DIGITS - 1 - np.floor(np.log10(np.abs(out))))
+        rounded = np.round(out * scale) / scale
+    return np.where(np.isfinite(rounded), rounded, out)
+
+
+def _volume_array(volume):
+    """成交量: 全部在 uint32 範圍內時用 uint32，否則 int64；缺失值記為 0"""
+    volume = np.nan_to_num(np.asarray(volume, dtype=np.float64), nan=0.0)
+    if len(volume) and (volume.min() < 0 or volume.max() > UINT32_MAX):
+        return volume.astype(np.int64)
+    return volume.astype(np.uint32)
+
+
+class CompactBars:
+    """
+    單一股票的緊湊K線 (struct-of-arrays): int64 時間戳 (UTC epoch ns)、float32 價格、
+    uint32 成交量 (超出範圍時 int64)；每根 28 字節，float64 DataFrame 約 48 字節
+    陣列可以是 BarUniverse 的切片或記憶體映射，不會被修改
+    """
+
+    def __init__(self, timestamp, open, high, low, close, volume, ticker=None):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.ticker = ticker
+
+    @classmethod
+    def from_frame(cls, df, ticker=None):
+        """
+        :param df: open/high/low/close/volume，時區索引 (無時區時視為美東時間)；其他欄位不保留
+        """
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize(ET_TZ)
+        prices = {c: np.ascontiguousarray(df[c].to_numpy(dtype=np.float32)) for c in PRICE_COLUMNS}
+        return cls(np.ascontiguousarray(index.as_unit('ns').asi8), volume=_volume_array(df['volume']),
+                   ticker=ticker, **prices)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __repr__(self):
+        return f"CompactBars({self.ticker}, {len(self)} bars, {self.nbytes / 1024:.1f} KB)"
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, c).nbytes for c in COLUMNS)
+
+    @property
+    def index(self):
+        """美東時間索引，與 timestamp 共用記憶體"""
+        return pd.DatetimeIndex(self.timestamp, dtype=INDEX_DTYPE, copy=False, name='Datetime')
+
+    def array(self, name):
+        """分析用的 float64 陣列 (見 to_float64)"""
+        return to_float64(getattr(self, name))
+
+    def between(self, start=None, end=None):
+        """start <= 時間 <= end 的K線 (切片，不複製)"""
+        lo = 0 if start is None else np.searchsorted(self.timestamp, _epoch_ns(start), side='left')
+        hi = len(self) if end is None else np.searchsorted(self.timestamp, _epoch_ns(end), side='right')
+        return CompactBars(*(getattr(self, c)[lo:hi] for c in COLUMNS), ticker=self.ticker)
+
+    def to_frame(self):
+        """
+        分析器與圖表使用的 DataFrame；各欄與索引直接引用現有陣列 (不複製)，
+        價格保持 float32，FeatureCache 取用時才逐欄轉為 float64
+        """
+        data = {c: getattr(self, c) for c in PRICE_COLUMNS + ('volume',)}
+        return pd.DataFrame(data, index=self.index, copy=False)
+
+
+def _epoch_ns(ts):
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize(ET_TZ) if ts.tzinfo is None else ts
+    return ts.as_unit('ns').value
+
+
+def as_frame(bars):
+    """CompactBars 轉為 DataFrame，DataFrame 原樣返回"""
+    return bars.to_frame() if isinstance(bars, CompactBars) else bars
+
+
+class BarUniverse:
+    """
+    多隻股票的緊湊K線: 全部股票首尾相接存放在同一組陣列 (每欄一個)，按 offsets 切出各股票，
+    可用 save / load 保存為 .npy 並以記憶體映射讀取；
+    支持 in、len、迭代、[ticker] 與 items()，可直接傳給 sr_batch.analyze_watchlist 與 backtest.run_backtest
+    """
+
+    def __init__(self, columns, tickers, offsets):
+        """
+        :param columns: {欄名: 陣列}，見 COLUMNS
+        :param offsets: 長度為 len(tickers) + 1，第 i 隻股票為 [offsets[i], offsets[i + 1])
+        """
+        self.columns = columns
+        self.tickers = list(tickers)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self._position = {t: i for i, t in enumerate(self.tickers)}
+
+    @classmethod
+    def from_bars(cls, bars):
+        """:param bars: CompactBars 列表 (ticker 必須不同)"""
+        bars = [b for b in bars if len(b)]
+        offsets = np.concatenate([[0], np.cumsum([len(b) for b in bars])])
+        columns = {}
+        for c in COLUMNS:
+            arrays = [getattr(b, c) for b in bars]
+            # 任一股票成交量超出 uint32 時整欄用 int64
+            columns[c] = np.concatenate(arrays) if arrays else np.empty(0, DTYPES[c])
+        return cls(columns, [b.ticker for b in bars], offsets)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """:param frames: {ticker: OHLCV DataFrame}"""
+        return cls.from_bars([CompactBars.from_frame(df, ticker) for ticker, df in frames.items()])
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._position
+
+    def __iter__(self):
+        return iter(self.tickers)
+
+    def __getitem__(self, ticker):
+        i = self._position[ticker]
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return CompactBars(*(self.columns[c][lo:hi] for c in COLUMNS), ticker=ticker)
+
+    def __repr__(self):
+        return f"BarUniverse({len(self)} tickers, {self.bars} bars, {self.nbytes / 2 ** 20:.1f} MB)"
+
+    def keys(self):
+        return list(self.tickers)
+
+    def values(self):
+        return [self[t] for t in self.tickers]
+
+    def items(self):
+        return [(t, self[t]) for t in self.tickers]
+
+    @property
+    def bars(self):
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.columns.values()) + self.offsets.nbytes
+
+    def save(self, path):
+        """保存到目錄 path: 每欄一個 .npy 與 tickers.json"""
+        os.makedirs(path, exist_ok=True)
+        for c in COLUMNS:
+            np.save(os.path.join(path, f"{c}.npy"), self.columns[c])
+        tmp_path = os.path.join(path, 'tickers.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump({'tickers': self.tickers, 'offsets': self.offsets.tolist()}, fh)
+        os.replace(tmp_path, os.path.join(path, 'tickers.json'))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        :param mmap: 以唯讀記憶體映射打開 (只在讀取時載入用到的頁面)，False 時完整讀入記憶體
+        """
+        with open(os.path.join(path, 'tickers.json'), encoding='utf-8') as fh:
+            meta = json.load(fh)
+        columns = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode='r' if mmap else None)
+                   for c in COLUMNS}
+        return cls(columns, meta['tickers'], meta['offsets'])
+
+
+def load_universe(tickers, interval='1m', days=14, store=None, prepost=True, update=True):
+    """
+    從本地緩存逐隻讀取並壓縮為 BarUniverse，任何時候只有一隻股票的 DataFrame 在記憶體中
+    :param update: 先按 bar_store.update_watchlist 補齊緩存 (增量下載)
+    """
+    from bar_store import BarStore, update_watchlist
+
+    store = store or BarStore()
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if update:
+        update_watchlist(tickers, interval=interval, days=days, store=store, prepost=prepost)
+    bars = []
+    for ticker in tickers:
+        df = store.read(ticker, interval, days=days)
+        if not df.empty:
+            bars.append(CompactBars.from_frame(df, ticker))
+    return BarUniverse.from_bars(bars)
+
+
+if __name__ == "__main__":
+    # 用法: python compact_bars.py [股票數] [天數]
+    # 用合成的 1 分鐘K線比較 DataFrame 與緊湊格式的記憶體佔用
+    from synthetic import synthetic_ohlcv
+
+    TICKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    DAYS = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+
+    frames = {f"T{i:03d}": synthetic_ohlcv(DAYS, seed=i) for i in range(TICKERS)}
+    frame_bytes = sum(df.memory_usage(index=True, deep=True).sum() for df in frames.values())
+    universe = BarUniverse.from_frames(frames)
+    print(universe)
+    print(f"DataFrame: {frame_bytes / 2 ** 20:.1f} MB，緊湊格式: {universe.nbytes / 2 ** 20:.1f} MB "
+          f"({universe.nbytes / frame_bytes:.0%})")
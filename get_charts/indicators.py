@@ -0,0 +1,306 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# numba 為可選依賴: 已安裝時使用 JIT 實現，否則使用純 NumPy 實現，結果相同 (浮點誤差以內)
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ('numba', 'numpy')
+BACKEND = 'numba' if numba is not None else 'numpy'
+
+# 交易時段 (美東時間)
+REGULAR_SESSION = ('09:30', '16:00')
+EXTENDED_SESSION = ('04:00', '20:00')
+
+
+def _resolve(backend):
+    backend = backend or BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown indicator backend: {backend}")
+    if backend == 'numba' and numba is None:
+        raise ValueError("numba is not installed")
+    return backend
+
+
+def _as_array(values):
+    """連續的 float64 陣列 (不複製已符合要求的輸入，也不修改輸入)"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _center(out, window, center):
+    """尾部對齊的結果改為與 pandas rolling(center=True) 相同的中心對齊"""
+    if not center:
+        return out
+    shift = window - 1 - window // 2
+    centered = np.full(len(out), np.nan)
+    centered[:len(out) - shift] = out[shift:]
+    return centered
+
+
+def _hold(values, valid, compressed):
+    """只在有效位置計算的遞歸序列放回原位置，無效位置沿用前一個值"""
+    out = np.full(len(values), np.nan)
+    out[valid] = compressed
+    positions = np.where(valid, np.arange(len(values)), -1)
+    positions = np.maximum.accumulate(positions)
+    held = positions >= 0
+    out[held] = out[positions[held]]
+    return out
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _rolling_sum_nb(x, window):
+        n = len(x)
+        out = np.full(n, np.nan)
+        total = 0.0
+        nans = 0
+        for i in range(n):
+            if np.isnan(x[i]):
+                nans += 1
+            else:
+                total += x[i]
+            if i >= window:
+                if np.isnan(x[i - window]):
+                    nans -= 1
+                else:
+                    total -= x[i - window]
+            if i >= window - 1 and nans == 0:
+                out[i] = total
+        return out
+
+    @numba.njit(cache=True)
+    def _rolling_std_nb(x, window, ddof):
+        # Welford 滑動窗口: 新值加入、舊值移出時更新均值與平方差和
+        n = len(x)
+        out = np.full(n, np.nan)
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        nans = 0
+        for i in range(n):
+            value = x[i]
+            if np.isnan(value):
+                nans += 1
+            else:
+                count += 1
+                delta = value - mean
+                mean += delta / count
+                m2 += delta * (value - mean)
+            if i >= window:
+                old = x[i - window]
+                if np.isnan(old):
+                    nans -= 1
+                else:
+                    count -= 1
+                    if count == 0:
+                        mean = 0.0
+                        m2 = 0.0
+                    else:
+                        delta = old - mean
+                        mean -= delta / count
+                        m2 -= delta * (old - mean)
+            if i >= window - 1 and nans == 0 and count > ddof:
+                out[i] = np.sqrt(max(m2, 0.0) / (count - ddof))
+        return out
+
+    @numba.njit(cache=True)
+    def _rolling_extreme_nb(x, window, sign):
+        # 單調隊列: 隊首為窗口內的極值位置 (sign=1 最大值，-1 最小值)
+        n = len(x)
+        out = np.full(n, np.nan)
+        queue = np.empty(n, dtype=np.int64)
+        head = 0
+        tail = 0
+        last_nan = -1
+        for i in range(n):
+            if np.isnan(x[i]):
+                last_nan = i
+            else:
+                while tail > head and sign * x[queue[tail - 1]] <= sign * x[i]:
+                    tail -= 1
+                queue[tail] = i
+                tail += 1
+            while tail > head and queue[head] <= i - window:
+                head += 1
+            if i >= window - 1 and last_nan <= i - window:
+                out[i] = x[queue[head]]
+        return out
+
+    @numba.njit(cache=True)
+    def _ewma_nb(x, alpha, seed):
+        out = np.empty(len(x))
+        value = seed
+        for i in range(len(x)):
+            value = alpha * x[i] + (1.0 - alpha) * value
+            out[i] = value
+        return out
+
+    @numba.njit(cache=True)
+    def _session_cumsum_nb(x, starts):
+        out = np.empty(len(x))
+        total = 0.0
+        for i in range(len(x)):
+            if starts[i]:
+                total = 0.0
+            if not np.isnan(x[i]):
+                total += x[i]
+            out[i] = total
+        return out
+
+
+def _ewma(x, alpha, seed, backend):
+    """y[i] = alpha * x[i] + (1 - alpha) * y[i-1]，y[-1] = seed"""
+    if len(x) == 0:
+        return np.zeros(0)
+    if backend == 'numba':
+        return _ewma_nb(x, alpha, seed)
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * seed])
+    return out
+
+
+def _session_cumsum(x, starts, backend):
+    """每個時段內的累積和 (NaN 視為 0)，starts 標記時段的第一根K線"""
+    if backend == 'numba':
+        return _session_cumsum_nb(x, starts)
+    total = np.cumsum(np.nan_to_num(x))
+    base = np.r_[0.0, total][np.flatnonzero(starts)]
+    return total - np.repeat(base, np.diff(np.r_[np.flatnonzero(starts), len(x)]))
+
+
+def rolling_sum(values, window, backend=None):
+    """與 pandas rolling(window).sum() 相同，窗口內有 NaN 時為 NaN"""
+    x = _as_array(values)
+    if window < 1 or len(x) < window:
+        return np.full(len(x), np.nan)
+    if _resolve(backend) == 'numba':
+        return _rolling_sum_nb(x, window)
+    nans = np.isnan(x)
+    total = np.cumsum(np.where(nans, 0.0, x))
+    counts = np.cumsum(nans)
+    out = np.full(len(x), np.nan)
+    sums = total[window - 1:] - np.r_[0.0, total[:-window]]
+    bad = (counts[window - 1:] - np.r_[0, counts[:-window]]) > 0
+    out[window - 1:] = np.where(bad, np.nan, sums)
+    return out
+
+
+def sma(values, window, center=False, backend=None):
+    """簡單移動平均 (pandas rolling(window).mean())"""
+    return _center(rolling_sum(values, window, backend) / window, window, center)
+
+
+def rolling_std(values, window, ddof=1, center=False, backend=None):
+    """滾動標準差 (pandas rolling(window).std())，numba 實現為 Welford 單次遍歷"""
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    if window < 1 or len(x) < window or window <= ddof:
+        return out
+    if _resolve(backend) == 'numba':
+        out = _rolling_std_nb(x, window, ddof)
+    else:
+        out[window - 1:] = np.std(sliding_window_view(x, window), axis=1, ddof=ddof)
+    return _center(out, window, center)
+
+
+def rolling_max(values, window, center=False, backend=None):
+    """滾動最大值 (pandas rolling(window).max())，窗口內有 NaN 時為 NaN"""
+    return _rolling_extreme(values, window, center, backend, 1.0)
+
+
+def rolling_min(values, window, center=False, backend=None):
+    """滾動最小值 (pandas rolling(window).min())，窗口內有 NaN 時為 NaN"""
+    return _rolling_extreme(values, window, center, backend, -1.0)
+
+
+def _rolling_extreme(values, window, center, backend, sign):
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    if window < 1 or len(x) < window:
+        return out
+    if _resolve(backend) == 'numba':
+        out = _rolling_extreme_nb(x, window, sign)
+    else:
+        func = np.max if sign > 0 else np.min
+        out[window - 1:] = func(sliding_window_view(x, window), axis=1)
+    return _center(out, window, center)
+
+
+def ema(values, span, backend=None):
+    """指數移動平均 (pandas ewm(span, adjust=False).mean())，NaN 位置沿用前一個值"""
+    x = _as_array(values)
+    valid = ~np.isnan(x)
+    if not valid.any():
+        return np.full(len(x), np.nan)
+    alpha = 2.0 / (span + 1.0)
+    compressed = x[valid]
+    return _hold(x, valid, _ewma(compressed, alpha, compressed[0], _resolve(backend)))
+
+
+def true_range(high, low, close):
+    """真實波幅 max(高-低, |高-前收|, |低-前收|)，第一根K線為高-低"""
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.r_[np.nan, close[:-1]]
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, window=14, backend=None):
+    """
+    Wilder ATR: 前 window 根真實波幅的均值起算，之後按 1/window 平滑
+    :return: 與輸入等長，前 window-1 根有效K線為 NaN，缺失K線沿用前一個值
+    """
+    tr = true_range(high, low, close)
+    valid = ~np.isnan(tr)
+    compressed = tr[valid]
+    if len(compressed) < window:
+        return np.full(len(tr), np.nan)
+    smoothed = np.full(len(compressed), np.nan)
+    seed = compressed[:window].mean()
+    smoothed[window - 1] = seed
+    smoothed[window:] = _ewma(compressed[window:], 1.0 / window, seed, _resolve(backend))
+    return _hold(tr, valid, smoothed)
+
+
+def session_mask(index, prepost=True):
+    """屬於交易時段的K線；prepost=False 時只保留正常交易時段"""
+    start, end = EXTENDED_SESSION if prepost else REGULAR_SESSION
+    minutes = index.hour * 60 + index.minute
+    start_min = int(start[:2]) * 60 + int(start[3:])
+    end_min = int(end[:2]) * 60 + int(end[3:])
+    return (minutes >= start_min) & (minutes < end_min)
+
+
+def session_ids(index):
+    """每根K線所屬交易日的編號 (按所在時區的日期)，非時間索引視為同一時段"""
+    if not isinstance(index, pd.DatetimeIndex):
+        return np.zeros(len(index), dtype=np.int64)
+    return index.normalize().asi8
+
+
+def session_vwap(high, low, close, volume, sessions=None, mask=None, backend=None):
+    """
+    成交量加權平均價 (典型價格 (高+低+收)/3)，缺失的成交量視為 0
+    :param sessions: 每根K線的時段編號 (見 session_ids)，編號改變時重新累積；None 為整段累積
+    :param mask: 只累積 mask 為 True 的K線 (如 session_mask)，其餘位置為 NaN
+    """
+    high, low, close, volume = _as_array(high), _as_array(low), _as_array(close), _as_array(volume)
+    if mask is not None:
+        volume = np.where(mask, volume, np.nan)
+    n = len(close)
+    starts = np.zeros(n, dtype=np.bool_)
+    if n:
+        starts[0] = True
+        if sessions is not None:
+            sessions = np.asarray(sessions)
+            starts[1:] = sessions[1:] != sessions[:-1]
+    backend = _resolve(backend)
+    pv = volume * (high + low + close) / 3
+    cum_pv = _session_cumsum(pv, starts, backend)
+    cum_v = _session_cumsum(np.where(np.isnan(pv), np.nan, volume), starts, backend)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(cum_v > 0, cum_pv / cum_v, np.nan)
+    return vwap if mask is None else np.where(mask, vwap, np.nan)
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def gap_group_starts(values, threshold):
+    """已排序數據中相鄰差距大於 threshold 處開始新的一組，返回每組起點"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.r_[0, np.flatnonzero(np.diff(values) > threshold) + 1]
+
+
+def mean_group_starts(values, threshold):
+    """
+    已排序數據逐個與當前組的均值比較，差距大於 threshold 時開始新的一組
+    相鄰差距明顯超過 threshold 的地方必然分組 (組均值不大於前一個水平)，其餘連續段內逐個與累計均值比較；
+    相鄰差距剛好在閾值附近的地方也留在段內，按組均值重新判斷
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    eps = 1e-9 * max(threshold, 1.0)
+    runs = np.r_[gap_group_starts(values, threshold + eps), n]
+    lengths = np.diff(runs)
+    starts = [runs[:-1]]
+    # 段內單次掃描，組均值用累計和維護，分組時重置 (O(n))
+    points = values.tolist()
+    for a, b in zip(runs[:-1][lengths >= 2].tolist(), runs[1:][lengths >= 2].tolist()):
+        s, total = a, points[a]
+        for i in range(a + 1, b):
+            deviation = abs(points[i] - total / (i - s))
+            # 剛好等於閾值附近的比較受求和順序影響，這些位置按 np.mean 重算，與逐個合併的結果一致
+            if abs(deviation - threshold) <= eps:
+                deviation = abs(points[i] - np.mean(values[s:i]))
+            if deviation > threshold:
+                starts.append([i])
+                s, total = i, points[i]
+            else:
+                total += points[i]
+    return np.unique(np.concatenate(starts)).astype(np.int64)
+
+
+def merge_levels(values, threshold, weights=None, sources=None, anchor='mean'):
+    """
+    合併相近的價格水平
+    :param anchor: 'mean' - 與當前組均值比較 (樞軸點合併)
+                   'gap'  - 與前一個水平比較 (多方法綜合)
+    :param weights: 每個水平的分數，None 為 1
+    :param sources: 每個水平的來源 (方法名)
+    :return: dict，每組一項:
+             level   - 組內均值
+             weight  - 組內分數總和
+             count   - 組內水平數
+             best    - 分數最高的來源 (相同價格的分數先加總，平手取價格較低者)
+             sources - 組內所有來源 (按價格排序)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+    if n == 0:
+        return {'level': np.zeros(0), 'weight': np.zeros(0), 'count': np.zeros(0, dtype=np.int64),
+                'best': [], 'sources': []}
+
+    order = np.argsort(values, kind='stable')
+    x, w = values[order], weights[order]
+    if anchor == 'mean':
+        starts = mean_group_starts(x, threshold)
+    elif anchor == 'gap':
+        starts = gap_group_starts(x, threshold)
+    else:
+        raise ValueError(f"Unknown anchor: {anchor}")
+
+    counts = np.diff(np.r_[starts, n])
+    result = {
+        'level': np.add.reduceat(x, starts) / counts,
+        'weight': np.add.reduceat(w, starts),
+        'count': counts,
+    }
+
+    if sources is not None:
+        labels = np.asarray(sources, dtype=object)[order]
+        # 相同價格 (不論來源) 的分數合併計算
+        _, inverse = np.unique(x, return_inverse=True)
+        value_score = np.bincount(inverse, weights=w)[inverse]
+        group = np.repeat(np.arange(len(starts)), counts)
+        top = np.maximum.reduceat(value_score, starts)
+        hits = np.flatnonzero(value_score == top[group])
+        _, first = np.unique(group[hits], return_index=True)
+        result['best'] = list(labels[hits[first]])
+        result['sources'] = [tuple(part) for part in np.split(labels, starts[1:])]
+    return result
@@ -0,0 +1,199 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance as yf
+import pandas as pd
+import pytz
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+ET_TZ = pytz.timezone('America/New_York')
+
+# 每次 yf.download 請求的股票數上限
+DOWNLOAD_CHUNK = 100
+
+# Yahoo 日內數據限制: 可回溯的日曆天數、單次請求可跨越的天數
+MAX_LOOKBACK_DAYS = {'1m': 30, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '90m': 60,
+                     '60m': 730, '1h': 730}
+MAX_REQUEST_DAYS = {'1m': 7}
+# 分段下載時的並發請求數
+FETCH_WORKERS = 8
+
+
+def period_days(period):
+    """yfinance 的 'Nd' period 轉為天數，其他格式返回 None"""
+    match = re.fullmatch(r'(\d+)d', str(period))
+    return int(match.group(1)) if match else None
+
+
+def normalize_ohlcv(data):
+    """統一為小寫 OHLCV 欄位、美東時區、按時間排序"""
+    data.columns = [str(c).lower() for c in data.columns]
+    data = data[OHLCV_COLUMNS]
+    # 多股票合併下載時，其他股票有數據的時間點在這裡全為 NaN
+    data = data[data[['open', 'high', 'low', 'close']].notna().any(axis=1)]
+    if data.index.tzinfo is None:
+        data.index = data.index.tz_localize('UTC').tz_convert(ET_TZ)
+    else:
+        data.index = data.index.tz_convert(ET_TZ)
+    data.index.name = 'Datetime'
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+    return data
+
+
+def split_by_ticker(data, tickers):
+    """
+    拆分 yf.download 的多股票結果 (MultiIndex 欄位，任一層為股票代碼)
+    :return: {ticker: OHLCV DataFrame}，只包含有數據的股票
+    """
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        # 單一股票且欄位已攤平
+        if len(tickers) == 1:
+            frame = normalize_ohlcv(data.copy())
+            if not frame.empty:
+                frames[tickers[0]] = frame
+        return frames
+
+    level = next((i for i in range(data.columns.nlevels)
+                  if set(tickers) & set(data.columns.get_level_values(i))), None)
+    if level is None:
+        return frames
+
+    available = set(data.columns.get_level_values(level))
+    for ticker in tickers:
+        if ticker not in available:
+            continue
+        frame = normalize_ohlcv(data.xs(ticker, axis=1, level=level))
+        if not frame.empty:
+            frames[ticker] = frame
+    return frames
+
+
+def as_et(ts):
+    """轉為美東時間，無時區的時間視為美東時間"""
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize(ET_TZ) if ts.tzinfo is None else ts.tz_convert(ET_TZ)
+
+
+def request_windows(interval, start, end=None, period=None):
+    """
+    按 Yahoo 限制切分時間範圍
+    :return: [(start, end), ...]；不需要切分時返回 None
+    """
+    limit = MAX_REQUEST_DAYS.get(interval)
+    if limit is None:
+        return None
+    end = as_et(end) if end is not None else pd.Timestamp.now(tz=ET_TZ)
+    if start is None:
+        days = period_days(period)
+        if days is None or days <= limit:
+            return None
+        start = end - pd.Timedelta(days=days)
+    start = as_et(start)
+
+    # 超出可回溯範圍的部分 Yahoo 一定返回錯誤，直接截掉
+    lookback = MAX_LOOKBACK_DAYS.get(interval)
+    if lookback is not None:
+        start = max(start, pd.Timestamp.now(tz=ET_TZ) - pd.Timedelta(days=lookback - 1))
+    if start >= end:
+        return []
+
+    step = pd.Timedelta(days=limit)
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows
+
+
+def _fetch_history(ticker, interval, start, end, prepost):
+    """:return: (OHLCV DataFrame 或 None, 請求是否成功)"""
+    try:
+        data = yf.Ticker(ticker).history(start=start, end=end, interval=interval, prepost=prepost)
+    except Exception as e:
+        print(f"Error downloading {ticker} {start:%Y-%m-%d}~{end:%Y-%m-%d}: {str(e)}")
+        return None, False
+    if data is None or data.empty:
+        return None, True
+    return normalize_ohlcv(data), True
+
+
+def download_windows(tickers, interval, windows, prepost=True, max_workers=FETCH_WORKERS):
+    """
+    每隻股票每個時間段一個請求，並發下載後按股票拼接
+    :return: ({ticker: OHLCV DataFrame}, 有請求失敗且沒有數據的股票列表)
+    """
+    tasks = [(t, s, e) for t in tickers for s, e in windows]
+    if not tasks:
+        return {}, []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        parts = list(pool.map(lambda task: _fetch_history(task[0], interval, task[1], task[2], prepost),
+                              tasks))
+
+    pieces, errors = {}, set()
+    for (ticker, _, _), (part, ok) in zip(tasks, parts):
+        if not ok:
+            errors.add(ticker)
+        elif part is not None and not part.empty:
+            pieces.setdefault(ticker, []).append(part)
+
+    frames = {}
+    for ticker, group in pieces.items():
+        frame = pd.concat(group).sort_index()
+        frames[ticker] = frame[~frame.index.duplicated(keep='last')]
+    return frames, [t for t in tickers if t in errors and t not in frames]
+
+
+def download_watchlist(tickers, period='5d', interval='1m', start=None, end=None,
+                       prepost=True, chunk_size=DOWNLOAD_CHUNK):
+    """
+    以少量 yf.download 請求 (每批 chunk_size 隻，多線程) 下載整個觀察名單
+    超出單次請求天數限制的日內數據 (如 1m 超過 7 天) 自動分段並發下載
+    :param start/end: 提供時取代 period
+    :return: ({ticker: OHLCV DataFrame}, 沒有數據的股票列表, 失敗的股票列表)
+             沒有數據 = 請求成功但沒有返回K線；失敗 = 請求出錯 (網絡、限流等) 或時間範圍超出可回溯範圍未發出請求，
+             失敗的股票不應記為沒有數據
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    windows = request_windows(interval, start, end, period)
+    if windows == []:
+        return {}, [], tickers
+    if windows is not None and len(windows) != 1:
+        frames, failed = download_windows(tickers, interval, windows, prepost=prepost)
+        return frames, [t for t in tickers if t not in frames and t not in failed], failed
+    if windows:
+        # 單段請求: 使用截斷後的範圍
+        (start, end), = windows
+
+    frames, failed = {}, []
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        kwargs = dict(start=start, end=end) if start is not None else dict(period=period)
+        try:
+            data = yf.download(chunk, interval=interval, prepost=prepost, group_by='ticker',
+                               threads=True, progress=False, **kwargs)
+        except Exception as e:
+            print(f"Error downloading {', '.join(chunk)}: {str(e)}")
+            failed.extend(chunk)
+            continue
+        chunk_frames = split_by_ticker(data, chunk)
+        if not chunk_frames and len(chunk) > 1:
+            # 整批都沒有數據多半是限流或網絡問題 (yf.download 不拋出異常)，不當作沒有數據
+            print(f"No data for any of {', '.join(chunk)}, treating as failed")
+            failed.extend(chunk)
+            continue
+        frames.update(chunk_frames)
+
+    missing = [t for t in tickers if t not in frames and t not in failed]
+    return frames, missing, failed
+
+
+def get_ohlcv(ticker, period='5d', interval='15m', start=None, end=None, prepost=True):
+    """下載單一股票，沒有數據時返回空 DataFrame"""
+    frames, _, _ = download_watchlist([ticker], period=period, interval=interval,
+                                   start=start, end=end, prepost=prepost)
+    return frames.get(ticker.upper(), pd.DataFrame(columns=OHLCV_COLUMNS))
@@ -0,0 +1,65 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _centered_extrema(values, window, find_max=True):
+    """
+    中心窗口極值檢測 (等同 rolling(window, center=True).apply 的舊邏輯)
+    窗口極值位於中心 (window//2-1 或 window//2) 時，在窗口中心位置記錄該極值，其他位置為 NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    views = sliding_window_view(values, window)
+    if find_max:
+        pos = views.argmax(axis=1)
+        extreme = views.max(axis=1)
+    else:
+        pos = views.argmin(axis=1)
+        extreme = views.min(axis=1)
+
+    center = window // 2
+    hit = (pos == center - 1) | (pos == center)
+    # 含 NaN 的窗口與 pandas rolling 一致視為無效
+    hit &= np.isfinite(extreme)
+
+    starts = np.flatnonzero(hit)
+    out[starts + center] = extreme[starts]
+    return out
+
+
+def local_extrema(high, low, window=10):
+    """
+    返回 (local_max, local_min) 兩個與輸入等長的陣列，非樞軸位置為 NaN
+    """
+    return (
+        _centered_extrema(high, window, find_max=True),
+        _centered_extrema(low, window, find_max=False),
+    )
+
+
+def pivot_levels(high, low, window=10):
+    """
+    樞軸點原始水平
+    :return: {'Support': 支撐價格陣列, 'Resistance': 阻力價格陣列} (按時間順序)
+    """
+    local_max, local_min = local_extrema(high, low, window)
+    return {
+        'Support': local_min[~np.isnan(local_min)],
+        'Resistance': local_max[~np.isnan(local_max)],
+    }
+
+
+def pivot_levels_batch(frames, window=10):
+    """
+    一次計算整個觀察名單的樞軸點
+    :param frames: {ticker: OHLCV DataFrame (小寫欄位)}
+    :return: {ticker: {'Support': ..., 'Resistance': ...}}
+    """
+    return {
+        ticker: pivot_levels(df['high'].to_numpy(), df['low'].to_numpy(), window)
+        for ticker, df in frames.items()
+    }
@@ -0,0 +1,121 @@
+import contextlib
+import io
+import os
+import re
+import time
+import tracemalloc
+
+# 環境變量開關 (調用時讀取，不需重啟)
+# SR_TRACEMALLOC=1            每個方法記錄 tracemalloc 峰值內存 (會使計算變慢約 2-3 倍)
+# SR_PROFILE=cprofile|pyinstrument  對整次 run_all_analysis 做剖析
+# SR_PROFILE_DIR=路徑          剖析結果寫入此目錄 (.prof / .html)，未設置時打印到終端
+PROFILERS = ('cprofile', 'pyinstrument')
+# 打印 cProfile 結果時顯示的函數數
+PROFILE_TOP = 25
+# 進行中的 measure 調用各自被嵌套調用清掉的峰值 (最內層在最後)
+_outer_peaks = []
+
+
+def tracemalloc_enabled():
+    return os.environ.get('SR_TRACEMALLOC', '').lower() in ('1', 'true', 'yes')
+
+
+def measure(func):
+    """
+    執行 func 並記錄耗時與結果
+    :return: (返回值, 記錄)；記錄含 seconds、status ('ok' / 'error')、error，
+             開啟 SR_TRACEMALLOC 時另含 peak_kb；失敗時返回值為 None，不拋出異常
+    """
+    trace = tracemalloc_enabled()
+    started_trace = trace and not tracemalloc.is_tracing()
+    if started_trace:
+        tracemalloc.start()
+    elif trace:
+        # 嵌套調用: reset_peak 會清掉外層的峰值，先記下，結束時由外層合併
+        if _outer_peaks:
+            _outer_peaks[-1] = max(_outer_peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    if trace:
+        _outer_peaks.append(0)
+    baseline = tracemalloc.get_traced_memory()[0] if trace else 0
+
+    start = time.perf_counter()
+    try:
+        value, status, error = func(), 'ok', None
+    except Exception as e:
+        value, status, error = None, 'error', str(e)
+    record = {'seconds': time.perf_counter() - start, 'status': status, 'error': error}
+
+    if trace:
+        peak = max(tracemalloc.get_traced_memory()[1], _outer_peaks.pop())
+        record['peak_kb'] = max(peak - baseline, 0) / 1024
+        if _outer_peaks:
+            _outer_peaks[-1] = max(_outer_peaks[-1], peak)
+        if started_trace:
+            tracemalloc.stop()
+    return value, record
+
+
+def _profile_path(label, suffix):
+    directory = os.environ.get('SR_PROFILE_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r'[^\w.-]+', '_', label)
+    return os.path.join(directory, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}{suffix}")
+
+
+@contextlib.contextmanager
+def profiled(label):
+    """
+    按 SR_PROFILE 剖析 with 區塊，未設置時不做任何事
+    :param label: 輸出標題與文件名 (如 'run_all_analysis:split')
+    """
+    kind = os.environ.get('SR_PROFILE', '').lower()
+    if not kind:
+        yield
+        return
+    if kind not in PROFILERS:
+        print(f"未知的 SR_PROFILE: {kind} (可選 {', '.join(PROFILERS)})")
+        yield
+        return
+
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("SR_PROFILE=pyinstrument 需要安裝 pyinstrument (pip install pyinstrument)")
+            yield
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = _profile_path(label, '.html')
+            if path:
+                with open(path, 'w', encoding='utf-8') as fh:
+                    fh.write(profiler.output_html())
+                print(f"剖析結果已保存到 {path}")
+            else:
+                print(f"\n⏱ {label}\n{profiler.output_text(unicode=True)}")
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = _profile_path(label, '.prof')
+        if path:
+            # 用 python -m pstats 或 snakeviz 查看
+            profiler.dump_stats(path)
+            print(f"剖析結果已保存到 {path}")
+        else:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            print(f"\n⏱ {label}\n{stream.getvalue()}")
@@ -0,0 +1,689 @@
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+from volume_profile import volume_at_price, bin_centers
+from trendlines import trendline_series, rolling_theil_sen, last_valid
+from pivots import local_extrema
+from ckmeans import ckmeans
+from levels import merge_levels
+from profiling import measure, profiled
+from compact_bars import to_float64
+import indicators
+
+# 分析方法註冊表: 名稱 -> {'func': 計算函數, 'inputs': 需要的欄位}
+METHODS = {}
+
+
+def register_method(name, inputs=('open', 'high', 'low', 'close', 'volume')):
+    """註冊分析方法，函數簽名為 func(features, **params)，失敗時拋出 ValueError"""
+    def decorator(func):
+        METHODS[name] = {'func': func, 'inputs': tuple(inputs)}
+        return func
+    return decorator
+
+
+# 按數據量自動調整的預設窗口 (multi 方法組合)
+AUTO_WINDOWS = {
+    'Pivot Points': lambda n: min(5, max(2, n // 3)),
+    'Bollinger Bands': lambda n: min(20, max(5, n // 2)),
+    'KMeans Clusters': lambda n: min(5, max(2, n // 10)),
+    'Volume Profile': lambda n: max(3, n // 5),
+    'Trendlines': lambda n: min(20, max(5, n // 3)),
+    'Smart Money': lambda n: min(20, max(3, n // 3)),
+}
+
+
+class FeatureCache:
+    """從 DataFrame 一次性提取的 NumPy 陣列與各方法共用的中間結果"""
+
+    def __init__(self, df):
+        self.df = df
+        self.index = df.index
+        self._arrays = {}
+        self._cache = {}
+        self.outputs = {}  # 方法產生的附帶序列 (如趨勢線、VWAP)
+
+    def __len__(self):
+        return len(self.df)
+
+    def array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = to_float64(self.df[name])
+        return self._arrays[name]
+
+    @property
+    def open(self):
+        return self.array('open')
+
+    @property
+    def high(self):
+        return self.array('high')
+
+    @property
+    def low(self):
+        return self.array('low')
+
+    @property
+    def close(self):
+        return self.array('close')
+
+    @property
+    def volume(self):
+        return self.array('volume')
+
+    def cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    # 指標序列 (見 indicators)，按參數緩存，不寫回 DataFrame
+    def rolling_max(self, name, window, center=False):
+        return self.cached(
+            ('rolling_max', name, window, center),
+            lambda: indicators.rolling_max(self.array(name), window, center)
+        )
+
+    def rolling_min(self, name, window, center=False):
+        return self.cached(
+            ('rolling_min', name, window, center),
+            lambda: indicators.rolling_min(self.array(name), window, center)
+        )
+
+    def sma(self, name, window):
+        return self.cached(('sma', name, window), lambda: indicators.sma(self.array(name), window))
+
+    def rolling_std(self, name, window, ddof=1):
+        return self.cached(
+            ('rolling_std', name, window, ddof),
+            lambda: indicators.rolling_std(self.array(name), window, ddof)
+        )
+
+    def atr(self, window=14):
+        return self.cached(('atr', window), lambda: indicators.atr(self.high, self.low, self.close, window))
+
+    def vwap(self, session=True, prepost=True):
+        """session=True 時每個交易日重新累積；prepost=False 時只用正常交易時段"""
+        def compute():
+            sessions = indicators.session_ids(self.index) if session else None
+            mask = None if prepost else indicators.session_mask(self.index, prepost=False)
+            return indicators.session_vwap(self.high, self.low, self.close, self.volume, sessions, mask)
+        return self.cached(('vwap', session, prepost), compute)
+
+    def mean_range(self):
+        """平均K線波幅 (簡化 ATR)"""
+        return self.cached('mean_range', lambda: float(np.nanmean(self.high - self.low)))
+
+
+def cluster_levels(levels, threshold=0.02, relative=False):
+    """
+    合併相近水平
+    :param relative: True 時 threshold 為相對所有水平均價的比例，否則為固定價差
+    """
+    if len(levels) == 0:
+        return []
+
+    if relative:
+        threshold = np.mean(levels) * threshold
+
+    merged = merge_levels(levels, threshold, anchor='mean')
+    return [float(round(level, 2)) for level in merged['level']]
+
+
+@register_method('Fibonacci', inputs=('high', 'low', 'close'))
+def fibonacci_levels(f, atr_multiplier=None, atr_window=None):
+    """
+    斐波那契回撤；設定 atr_multiplier 時只採用突破 ATR 倍數的波段高低點
+    :param atr_window: None 時 ATR 為全部K線的平均波幅；設定時為當時的 Wilder ATR (真實波幅)
+    """
+    high = np.nanmax(f.high)
+    low = np.nanmin(f.low)
+
+    if atr_multiplier is not None:
+        highs = f.rolling_max('high', 5)
+        lows = f.rolling_min('low', 5)
+        atr = f.mean_range() if atr_window is None else f.atr(atr_window)
+
+        valid_highs = highs[np.diff(highs, prepend=np.nan) > atr * atr_multiplier]
+        valid_lows = lows[np.diff(lows, prepend=np.nan) < -atr * atr_multiplier]
+        if len(valid_highs):
+            high = valid_highs.max()
+        if len(valid_lows):
+            low = valid_lows.min()
+
+    return fibonacci_from_range(high, low)
+
+
+def fibonacci_from_range(high, low):
+    diff = high - low
+    return {
+        '0%': high,
+        '23.6%': high - diff * 0.236,
+        '38.2%': high - diff * 0.382,
+        '50%': high - diff * 0.5,
+        '61.8%': high - diff * 0.618,
+        '100%': low
+    }
+
+
+def peak_candidates(values):
+    """所有局部高點的位置與 prominence；按 prominence 篩選即等於 find_peaks(values, prominence=p)"""
+    idx, props = find_peaks(values, prominence=0)
+    return idx, props['prominences']
+
+
+def pivot_indices(high, low, style='peaks', window=10, prominence=0.1, candidates=None):
+    """
+    樞軸點位置與價格
+    :param candidates: peaks 模式下已計算的 (peak_candidates(high), peak_candidates(-low))，
+                       不同 prominence 共用
+    :return: (阻力位置, 阻力價格, 支撐位置, 支撐價格)
+    """
+    if style == 'rolling':
+        res_idx = np.flatnonzero(high == indicators.rolling_max(high, window, center=True))
+        sup_idx = np.flatnonzero(low == indicators.rolling_min(low, window, center=True))
+        return res_idx, high[res_idx], sup_idx, low[sup_idx]
+
+    if style == 'centered':
+        # 中心極值記錄的是窗口極值，不一定等於該位置的價格
+        local_max, local_min = local_extrema(high, low, window)
+        res_idx = np.flatnonzero(~np.isnan(local_max))
+        sup_idx = np.flatnonzero(~np.isnan(local_min))
+        return res_idx, local_max[res_idx], sup_idx, local_min[sup_idx]
+
+    if style == 'peaks':
+        (res_idx, res_prom), (sup_idx, sup_prom) = candidates or (peak_candidates(high), peak_candidates(-low))
+        res_idx = res_idx[res_prom >= prominence]
+        sup_idx = sup_idx[sup_prom >= prominence]
+        res_idx = res_idx[~np.isnan(high[res_idx])]
+        sup_idx = sup_idx[~np.isnan(low[sup_idx])]
+        return res_idx, high[res_idx], sup_idx, low[sup_idx]
+
+    raise ValueError(f"Unknown pivot style: {style}")
+
+
+def format_pivots(resistance, support, style='peaks', threshold=0.02):
+    """按 style 整理樞軸點價格 (按時間順序)"""
+    if style == 'rolling':
+        resistance = pd.unique(resistance)
+        support = pd.unique(support)
+        if len(resistance) == 0 or len(support) == 0:
+            raise ValueError("無法識別有效的樞軸點")
+        return {'Support': support, 'Resistance': resistance}
+
+    relative = style == 'centered'
+    return {
+        'Support': cluster_levels(support, threshold, relative=relative),
+        'Resistance': cluster_levels(resistance, threshold, relative=relative)
+    }
+
+
+@register_method('Pivot Points', inputs=('high', 'low'))
+def pivot_points(f, style='peaks', window=None, prominence=0.1, threshold=0.02):
+    """
+    樞軸點
+    style: rolling  - 中心滾動窗口極值 (窗口自動調整，返回原始水平)
+           centered - 極值位於窗口中心，按相對閾值合併
+           peaks    - scipy find_peaks 按 prominence 篩選，按固定價差合併
+    """
+    n = len(f)
+    if style == 'rolling':
+        # 動態調整窗口大小，確保不大於可用數據量的1/3
+        window = window or AUTO_WINDOWS['Pivot Points'](n)
+        if n < window * 2:
+            raise ValueError("數據不足，無法計算樞軸點")
+    elif style == 'centered':
+        window = window or 10
+        if n < window:
+            raise ValueError("Insufficient data for pivot points")
+
+    candidates = None
+    if style == 'peaks':
+        candidates = f.cached('peak_candidates', lambda: (peak_candidates(f.high), peak_candidates(-f.low)))
+    _, resistance, _, support = f.cached(
+        ('pivot_indices', style, window, prominence),
+        lambda: pivot_indices(f.high, f.low, style, window, prominence, candidates))
+    return format_pivots(resistance, support, style, threshold)
+
+
+@register_method('Bollinger Bands', inputs=('close',))
+def bollinger_bands(f, window=None, std_dev=2, style='levels'):
+    """
+    布林帶最新值
+    style: levels - {'Support', 'Resistance'}；bands - {'Upper', 'Middle', 'Lower'}
+    """
+    n = len(f)
+    window = window or AUTO_WINDOWS['Bollinger Bands'](n)
+    if n < window:
+        raise ValueError("Insufficient data for Bollinger Bands")
+
+    middle = f.sma('close', window)[-1]
+    std = f.rolling_std('close', window)[-1]
+    upper = middle + std * std_dev
+    lower = middle - std * std_dev
+
+    if style == 'bands':
+        return {'Upper': upper, 'Middle': middle, 'Lower': lower}
+    return {'Support': lower, 'Resistance': upper}
+
+
+@register_method('KMeans Clusters', inputs=('high', 'low', 'close', 'volume'))
+def kmeans_clusters(f, n_clusters=None, columns=('close',), weighted=False):
+    """
+    價格聚類中心 (一維最優 k-means，結果固定)
+    :param n_clusters: None 時按數據量自動調整，'auto' 時按 BIC 在 2-5 之間選擇
+    :param columns: 多個欄位時合併為同一組價格一起聚類
+    :param weighted: 以成交量為權重
+    """
+    n = len(f)
+    if n_clusters is None:
+        n_clusters = AUTO_WINDOWS['KMeans Clusters'](n)
+        min_samples = n_clusters * 2
+    elif n_clusters == 'auto':
+        min_samples = 2
+    else:
+        min_samples = n_clusters
+    if n < min_samples:
+        raise ValueError("Insufficient data for KMeans")
+
+    prices = np.concatenate([f.array(c) for c in columns])
+    weights = np.tile(f.volume, len(columns)) if weighted else None
+    centers, _ = ckmeans(prices, None if n_clusters == 'auto' else n_clusters, weights=weights)
+    return [float(c) for c in centers]
+
+
+def profile_edges(low, high, n, style='percentile', bins=20, price_step=0.5):
+    """
+    成交量分布的價格區間邊界
+    style: peak       - 等分價格區間 (分箱數按數據量自動調整)
+           percentile - 動態步長 (最小 $0.01)
+           sigma      - 固定步長 price_step
+    """
+    if style == 'peak':
+        # 動態調整分箱數量
+        bins = min(bins, AUTO_WINDOWS['Volume Profile'](n))
+        if n < bins * 2:
+            raise ValueError("數據不足，無法計算成交量分布")
+        return np.linspace(low, high, bins)
+
+    if n < 20:
+        raise ValueError("Insufficient data for Volume Profile")
+
+    if style == 'percentile':
+        step = max(0.01, (high - low) / bins)  # Penny Stock最小步長$0.01
+    elif style == 'sigma':
+        step = price_step
+    else:
+        raise ValueError(f"Unknown volume profile style: {style}")
+    return np.arange(np.floor(low), np.ceil(high) + step, step)
+
+
+def select_profile_levels(edges, volumes, style='percentile'):
+    """
+    從成交量分布挑選水平
+    style: peak       - 成交量最大的區間下沿 (單一數值)
+           percentile - 成交量前 20% 的區間中點
+           sigma      - 成交量高於均值 + 1 標準差的區間中點
+    """
+    if style == 'peak':
+        if volumes.sum() <= 0:
+            raise ValueError("無成交量數據")
+        return float(edges[np.argmax(volumes)])
+
+    if len(volumes) == 0:
+        return []
+    prices = bin_centers(edges)
+
+    if style == 'percentile':
+        threshold = np.percentile(volumes, 80)
+        return prices[volumes >= threshold].tolist()
+
+    traded = volumes[volumes > 0]
+    if len(traded) == 0:
+        return []
+    return prices[volumes > np.mean(traded) + np.std(traded)].tolist()
+
+
+@register_method('Volume Profile', inputs=('high', 'low', 'close', 'volume'))
+def volume_profile(f, style='percentile', bins=20, price_step=0.5, mode='range'):
+    """成交量分布，style 見 profile_edges / select_profile_levels"""
+    edges = profile_edges(np.nanmin(f.low), np.nanmax(f.high), len(f), style, bins, price_step)
+    volumes = volume_at_price(f.high, f.low, f.close, f.volume, edges, mode=mode)
+    return select_profile_levels(edges, volumes, style)
+
+
+@register_method('Trendlines', inputs=('high', 'low'))
+def trendlines(f, style='ols', window=None, angle_threshold=5, sample_size=50, seed=42):
+    """
+    趨勢線
+    style: ols       - 滾動最小二乘，完整序列存入 outputs['trendline_series']
+           theil_sen - 以固定種子抽樣窗口做 Theil-Sen 回歸，取最近三個有效窗口的平均
+    """
+    n = len(f)
+    if style == 'ols':
+        window = window or AUTO_WINDOWS['Trendlines'](n)
+        if n < window * 2:
+            raise ValueError("數據不足，無法計算趨勢線")
+
+        support, resistance = f.cached(
+            ('trendline_series', window), lambda: trendline_series(f.low, f.high, window))
+        f.outputs['trendline_series'] = pd.DataFrame(
+            {'support': support, 'resistance': resistance}, index=f.index)
+
+        current_support = last_valid(support)
+        current_resistance = last_valid(resistance)
+        if current_support is None or current_resistance is None:
+            raise ValueError("無有效趨勢線")
+        return {
+            'Current Support': current_support,
+            'Current Resistance': current_resistance
+        }
+
+    if style != 'theil_sen':
+        raise ValueError(f"Unknown trendline style: {style}")
+
+    window = window or 20
+    if n < window:
+        raise ValueError("Insufficient data for Trendlines")
+
+    rng = np.random.default_rng(seed)
+    sample_indices = np.sort(rng.choice(
+        np.arange(window, n), size=min(sample_size, n - window), replace=False))
+    ends = sample_indices - 1
+
+    slope, intercept = rolling_theil_sen(f.low, window, ends=ends, seed=seed)
+    angle = np.degrees(np.arctan(slope))
+    valid_support = (intercept + slope * (window - 1))[
+        (slope < 0) & (np.abs(angle) > angle_threshold)]
+
+    slope, intercept = rolling_theil_sen(f.high, window, ends=ends, seed=seed)
+    angle = np.degrees(np.arctan(slope))
+    valid_resistance = (intercept + slope * (window - 1))[
+        (slope > 0) & (np.abs(angle) > angle_threshold)]
+
+    return {
+        'Current Support': np.mean(valid_support[-3:]) if len(valid_support) else None,
+        'Current Resistance': np.mean(valid_resistance[-3:]) if len(valid_resistance) else None
+    }
+
+
+@register_method('Smart Money', inputs=('high', 'low', 'close', 'volume'))
+def smart_money_levels(f, window=None, session=True, prepost=True):
+    """
+    成交量堆積區的近期高低點，VWAP 序列存入 outputs['vwap']
+    :param session: VWAP 每個交易日重新累積 (False 為整段數據累積)
+    :param prepost: VWAP 是否包含盤前盤後
+    """
+    n = len(f)
+    if n < 5:
+        raise ValueError("數據不足，無法計算聰明錢水平")
+
+    f.outputs['vwap'] = pd.Series(f.vwap(session, prepost), index=f.index)
+
+    # 尋找成交量堆積區
+    window = window or AUTO_WINDOWS['Smart Money'](n)
+    support = last_valid(f.rolling_min('low', window))
+    resistance = last_valid(f.rolling_max('high', window))
+    if support is None or resistance is None:
+        raise ValueError("數據不足，無法計算聰明錢水平")
+    return {'Support': support, 'Resistance': resistance}
+
+
+# get_all_levels 綜合各方法時的權重 (未列出的為 1.0)
+LEVEL_WEIGHTS = {
+    'Volume Profile': 2.0,
+    'Pivot Points': 1.5,
+    'Trendlines': 1.2,
+    'Fibonacci': 1.0,
+    'Bollinger Bands': 0.8,
+    'KMeans Clusters': 0.5
+}
+
+
+# 各腳本原有的方法組合與參數 (按執行順序)
+PROFILES = {
+    # get_yf_sr_multi.py: 窗口與分箱按數據量自動調整
+    'multi': {
+        'Fibonacci': {},
+        'Pivot Points': {'style': 'rolling'},
+        'Bollinger Bands': {'style': 'levels'},
+        'KMeans Clusters': {},
+        'Volume Profile': {'style': 'peak', 'mode': 'contained'},
+        'Trendlines': {'style': 'ols'},
+        'Smart Money': {},
+    },
+    # get_yf_sr_multi_plot_split.py
+    'split': {
+        'Fibonacci': {'atr_multiplier': 1.5},
+        'Pivot Points': {'style': 'peaks', 'prominence': 0.1, 'threshold': 0.02},
+        'Bollinger Bands': {'window': 20, 'style': 'bands'},
+        'KMeans Clusters': {'n_clusters': 5, 'columns': ('high', 'low', 'close')},
+        'Volume Profile': {'style': 'percentile', 'bins': 20},
+    },
+    # get_yt_sr_multi_plot.py
+    'yt': {
+        'Fibonacci': {},
+        'Pivot Points': {'style': 'centered', 'window': 10, 'threshold': 0.005},
+        'Bollinger Bands': {'window': 20, 'style': 'levels'},
+        'KMeans Clusters': {'n_clusters': 5},
+        'Volume Profile': {'style': 'sigma', 'price_step': 0.5},
+        'Trendlines': {'style': 'theil_sen', 'window': 20},
+    },
+}
+# get_yf_sr_multi_plot_split2.py: 更高的 prominence 與更寬的合併閾值
+PROFILES['split2'] = dict(PROFILES['split'])
+PROFILES['split2']['Pivot Points'] = {'style': 'peaks', 'prominence': 0.3, 'threshold': 0.05}
+
+
+class SupportResistanceAnalyzer:
+    def __init__(self, df, profile='split', params=None, features=None):
+        """
+        :param profile: PROFILES 中的方法組合名稱
+        :param params: 覆蓋個別方法參數，如 {'Pivot Points': {'prominence': 0.3}}
+        :param features: 同一份 df 的 FeatureCache，多個配置 (如參數掃描) 共用中間結果與方法結果
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown analyzer profile: {profile}")
+        self._df = df
+        self._pending = []  # update() 追加但尚未併入 DataFrame 的K線
+        self._stream = None
+        self.profile = profile
+        self.params = {name: dict(p) for name, p in PROFILES[profile].items()}
+        for name, overrides in (params or {}).items():
+            self.params.setdefault(name, {}).update(overrides)
+        self.features = features if features is not None else FeatureCache(df)
+        self.results = {}
+        self.timings = {}  # 方法名 -> 最近一次執行的耗時記錄 (見 _run_safe)
+
+    @property
+    def df(self):
+        """分析數據 (含 update() 追加的K線，需要時才合併)"""
+        if self._pending:
+            rows = pd.DataFrame(
+                [bar for _, bar in self._pending],
+                index=pd.Index([ts for ts, _ in self._pending], name=self._df.index.name)
+            )
+            self._df = pd.concat([self._df, rows[self._df.columns.intersection(rows.columns)]])
+            self._pending = []
+            self.features = FeatureCache(self._df)
+        return self._df
+
+    @property
+    def trendline_series(self):
+        """完整趨勢線序列 (Trendlines ols 計算後可用)"""
+        return self.features.outputs.get('trendline_series')
+
+    @property
+    def vwap_series(self):
+        """VWAP 序列 (Smart Money 計算後可用)"""
+        return self.features.outputs.get('vwap')
+
+    def run_method(self, name, **params):
+        """執行單一方法並寫入 results，失敗時拋出異常"""
+        if name not in METHODS:
+            raise ValueError(f"Unknown analysis method: {name}")
+        spec = METHODS[name]
+        df = self.df
+        missing = [c for c in spec['inputs'] if c not in df.columns]
+        if missing:
+            raise ValueError(f"Missing columns for {name}: {missing}")
+
+        kwargs = dict(self.params.get(name, {}))
+        kwargs.update(params)
+        # 相同參數的結果按 FeatureCache 緩存 (K線更新時 FeatureCache 會重建)
+        key = ('method', name, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        self.results[name] = self.features.cached(key, lambda: spec['func'](self.features, **kwargs))
+        return self.results[name]
+
+    def _run_safe(self, name, **params):
+        """執行單一方法，失敗時結果記為 "N/A"；耗時、狀態與內存峰值記錄到 self.timings"""
+        _, record = measure(lambda: self.run_method(name, **params))
+        if record['status'] == 'error':
+            print(f"Method {name} failed: {record['error']}")
+            self.results[name] = "N/A"
+        self.timings[name] = record
+        return self.results[name]
+
+    def run_all_analysis(self, methods=None):
+        """
+        :param methods: 要執行的方法名稱列表，預設為 profile 的全部方法
+        :return: results；results['_meta'] 為本次執行的記錄:
+                 profile、bars、seconds 及 methods (方法名 -> seconds/status/error[/peak_kb])
+                 按環境變量開啟內存記錄與剖析，見 profiling
+        """
+        if len(self.df) < 3:
+            print("警告: 數據量過少，無法進行有效分析。請嘗試獲取更多數據。")
+            self.results['Error'] = "數據不足"
+            return self.results
+
+        names = methods or list(self.params)
+        # 完整重算後增量狀態 (窗口、分箱、KMeans 中心) 已過期，下次 update 以新結果重新初始化
+        self._stream = None
+        start = time.perf_counter()
+        with profiled(f"run_all_analysis:{self.profile}:{len(self.df)}"):
+            for name in names:
+                self._run_safe(name)
+        self.results['_meta'] = {
+            'profile': self.profile,
+            'bars': len(self.df),
+            'seconds': time.perf_counter() - start,
+            'methods': {name: self.timings[name] for name in names},
+        }
+        return self.results
+
+    def update(self, bar):
+        """
+        追加一根新K線並增量更新各方法的水平 (每根 O(window)，不重算整段歷史)
+        首次調用時以現有數據初始化增量狀態；run_all_analysis 仍會完整重算
+        peaks 模式的樞軸點只在最近的K線上重算 prominence，與完整重算可能不同 (見 sr_stream.StreamingState)
+        :param bar: 含 open/high/low/close/volume 的 dict 或 Series，
+                    時間取 Series.name 或 bar['datetime']
+        :return: 更新後的 results
+        """
+        from sr_stream import StreamingState
+
+        if self._stream is None:
+            self._stream = StreamingState(self.features, self.params, self.results)
+
+        timestamp = bar.get('datetime', getattr(bar, 'name', None))
+        values = {k: float(bar[k]) for k in ('open', 'high', 'low', 'close', 'volume') if k in bar}
+        self._pending.append((timestamp, values))
+
+        self.results.update(self._stream.update(
+            values['high'], values['low'], values['close'], values.get('volume', 0.0), timestamp))
+        return self.results
+
+    def fibonacci_levels(self, **params):
+        return self._run_safe('Fibonacci', **params)
+
+    def pivot_points(self, **params):
+        return self._run_safe('Pivot Points', **params)
+
+    def bollinger_bands(self, **params):
+        return self._run_safe('Bollinger Bands', **params)
+
+    def kmeans_clusters(self, **params):
+        return self._run_safe('KMeans Clusters', **params)
+
+    def volume_profile(self, **params):
+        return self._run_safe('Volume Profile', **params)
+
+    def trendlines(self, **params):
+        return self._run_safe('Trendlines', **params)
+
+    def smart_money_levels(self, **params):
+        return self._run_safe('Smart Money', **params)
+
+    def merge_all_levels(self, support_levels, resistance_levels):
+        """
+        按方法權重與距現價的遠近為每個水平打分，合併相距 0.5% 以內的水平
+        :param support_levels/resistance_levels: [(方法名, 價格), ...]
+        :return: {'Support': merge_levels 結果, 'Resistance': ...}，含來源方法與分數
+        """
+        current_price = to_float64(self.df['close'].to_numpy()[-1:])[0]
+        tolerance = current_price * 0.005
+        details = {}
+        for level_type, levels in (('Support', support_levels), ('Resistance', resistance_levels)):
+            methods = [method for method, _ in levels]
+            values = np.array([value for _, value in levels], dtype=np.float64)
+            weights = np.array([LEVEL_WEIGHTS.get(m, 1.0) for m in methods])
+            proximity = np.where(np.abs(values - current_price) / current_price < 0.02, 1.5, 1.0)
+            details[level_type] = merge_levels(values, tolerance, weights=weights * proximity,
+                                               sources=methods, anchor='gap')
+        return details
+
+    def get_all_levels(self):
+        """Return all support and resistance levels in a structured way"""
+        support_levels = []
+        resistance_levels = []
+
+        # Extract levels from results
+        for method, values in self.results.items():
+            if isinstance(values, str) or method.startswith('_'):
+                continue
+
+            if isinstance(values, dict):
+                # For methods that return a dict with 'Support' and 'Resistance' keys
+                if 'Support' in values:
+                    if isinstance(values['Support'], (float, int, np.floating)):
+                        support_levels.append((method, values['Support']))
+                    elif isinstance(values['Support'], (list, np.ndarray)):
+                        for level in values['Support']:
+                            support_levels.append((method, level))
+                if 'Resistance' in values:
+                    if isinstance(values['Resistance'], (float, int, np.floating)):
+                        resistance_levels.append((method, values['Resistance']))
+                    elif isinstance(values['Resistance'], (list, np.ndarray)):
+                        for level in values['Resistance']:
+                            resistance_levels.append((method, level))
+
+                # Special case for Fibonacci levels
+                if method == 'Fibonacci':
+                    for key, value in values.items():
+                        if key in ['0%', '23.6%', '38.2%']:
+                            resistance_levels.append((f"Fib {key}", value))
+                        elif key in ['61.8%', '100%']:
+                            support_levels.append((f"Fib {key}", value))
+                        elif key == '50%':
+                            resistance_levels.append((f"Fib {key}", value))
+                            support_levels.append((f"Fib {key}", value))
+
+            # For methods that return a list of levels (like KMeans)
+            elif isinstance(values, list):
+                if values:
+                    support_levels.append((method, min(values)))
+                    resistance_levels.append((method, max(values)))
+
+            # For methods that return a single value (like Volume Profile)
+            elif isinstance(values, (float, int, np.floating)):
+                support_levels.append((method, values))
+                resistance_levels.append((method, values))
+
+        details = self.merge_all_levels(support_levels, resistance_levels)
+        merged_levels = {}
+        for level_type, merged in details.items():
+            merged_levels[level_type] = [(best, float(round(level, 2)))
+                                         for best, level in zip(merged['best'], merged['level'])]
+        return merged_levels
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from bar_store import load_watchlist, period_days
+from compact_bars import as_frame
+from market_data import download_watchlist
+from sr_analyzer import SupportResistanceAnalyzer
+
+LEVEL_COLUMNS = ['ticker', 'method', 'label', 'level', 'bars', 'seconds', 'status', 'error']
+# 每隻股票每個方法一行的耗時記錄 (peak_kb 只在 SR_TRACEMALLOC=1 時有值)
+TIMING_COLUMNS = ['ticker', 'method', 'bars', 'seconds', 'status', 'error', 'peak_kb']
+
+
+def normalize_tickers(source):
+    """
+    觀察名單: 代碼列表、含 Symbol 欄的 DataFrame (漲幅股腳本的輸出)、csv/txt 路徑，或單一代碼
+    """
+    if isinstance(source, str):
+        if not os.path.isfile(source):
+            source = [source]
+        elif source.lower().endswith('.csv'):
+            source = pd.read_csv(source)
+        else:
+            with open(source, encoding='utf-8') as fh:
+                source = [line.strip() for line in fh if line.strip()]
+    if isinstance(source, pd.DataFrame):
+        source = source['Symbol'].tolist()
+
+    tickers = []
+    for ticker in source:
+        ticker = str(ticker).strip().upper()
+        if ticker and ticker not in tickers:
+            tickers.append(ticker)
+    return tickers
+
+
+def results_to_rows(ticker, results):
+    """把 run_all_analysis 的結果展開為 (ticker, method, label, level) 記錄"""
+    rows = []
+    for method, values in results.items():
+        if isinstance(values, str) or method.startswith('_'):
+            continue
+        if isinstance(values, dict):
+            items = values.items()
+        elif isinstance(values, (list, np.ndarray)):
+            items = [('Level', v) for v in values]
+        else:
+            items = [('Level', values)]
+
+        for label, value in items:
+            for v in np.atleast_1d(np.asarray(value, dtype=object)):
+                if v is None or pd.isna(v):
+                    continue
+                rows.append({'ticker': ticker, 'method': method, 'label': label, 'level': float(v)})
+    return rows
+
+
+def load_frames(tickers, period='5d', interval='1m'):
+    """'Nd' period 走本地緩存 + 增量下載，其他格式直接批量下載；返回 {ticker: DataFrame}"""
+    days = period_days(period)
+    if days is not None:
+        frames, _ = load_watchlist(tickers, interval=interval, days=days)
+    else:
+        frames, _, _ = download_watchlist(tickers, period=period, interval=interval)
+    return frames
+
+
+def _analyze_chunk(items, profile, params, methods):
+    """在工作進程中分析一批股票，每隻股票的錯誤互不影響；返回 (水平記錄, 方法耗時記錄)"""
+    records, timings = [], []
+    for ticker, df in items:
+        start = time.perf_counter()
+        try:
+            analyzer = SupportResistanceAnalyzer(as_frame(df), profile=profile, params=params)
+            results = analyzer.run_all_analysis(methods=methods)
+            if 'Error' in results:
+                raise ValueError(results['Error'])
+            rows = results_to_rows(ticker, results)
+            timings.extend({'ticker': ticker, 'method': method, 'bars': len(df), **record}
+                           for method, record in results['_meta']['methods'].items())
+            status, error = 'ok', None
+        except Exception as e:
+            rows, status, error = [], 'error', str(e)
+
+        meta = {'bars': len(df), 'seconds': time.perf_counter() - start,
+                'status': status, 'error': error}
+        if not rows:
+            rows = [{'ticker': ticker, 'method': None, 'label': None, 'level': np.nan}]
+        records.extend({**row, **meta} for row in rows)
+    return records, timings
+
+
+def analyze_watchlist(tickers, period='5d', interval='1m', profile='split', params=None,
+                      methods=None, frames=None, max_workers=None, chunk_size=8, with_timings=False):
+    """
+    批量分析多隻股票的支撐阻力
+    :param tickers: 見 normalize_tickers
+    :param frames: 已下載的 {ticker: DataFrame} 或 compact_bars.BarUniverse，提供時不再下載
+    :param chunk_size: 每個任務處理的股票數，減少進程間調度開銷
+    :param with_timings: 同時返回各方法的耗時記錄 (TIMING_COLUMNS)，用 summarize_methods 匯總
+    :return: 每個水平一行的 DataFrame (LEVEL_COLUMNS)，失敗或無數據的股票各佔一行；
+             with_timings 時為 (levels, timings)
+    """
+    tickers = normalize_tickers(tickers)
+    if frames is None:
+        frames = load_frames(tickers, period=period, interval=interval)
+
+    records, timings = [], []
+    for ticker in tickers:
+        if ticker not in frames:
+            records.append({'ticker': ticker, 'method': None, 'label': None, 'level': np.nan,
+                            'bars': 0, 'seconds': 0.0, 'status': 'no data', 'error': None})
+
+    items = [(t, frames[t]) for t in tickers if t in frames]
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if chunks:
+        max_workers = max_workers or min(len(chunks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_analyze_chunk, chunk, profile, params, methods): chunk
+                       for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    chunk_records, chunk_timings = future.result()
+                    records.extend(chunk_records)
+                    timings.extend(chunk_timings)
+                except Exception as e:
+                    # 工作進程崩潰時整批標記為失敗
+                    for ticker, df in futures[future]:
+                        records.append({'ticker': ticker, 'method': None, 'label': None,
+                                        'level': np.nan, 'bars': len(df), 'seconds': np.nan,
+                                        'status': 'error', 'error': str(e)})
+
+    order = {t: i for i, t in enumerate(tickers)}
+    levels = pd.DataFrame(records, columns=LEVEL_COLUMNS)
+    levels = levels.sort_values('ticker', key=lambda s: s.map(order), kind='stable')
+    levels = levels.reset_index(drop=True)
+    if not with_timings:
+        return levels
+    timings = pd.DataFrame(timings, columns=TIMING_COLUMNS)
+    timings = timings.sort_values('ticker', key=lambda s: s.map(order), kind='stable')
+    return levels, timings.reset_index(drop=True)
+
+
+def summarize(levels):
+    """每隻股票一行: K線數、耗時、狀態、水平數量"""
+    return levels.groupby('ticker', sort=False).agg(
+        bars=('bars', 'first'),
+        seconds=('seconds', 'first'),
+        status=('status', 'first'),
+        error=('error', 'first'),
+        levels=('level', 'count'),
+    )
+
+
+def summarize_methods(timings):
+    """
+    每個方法一行: 股票數、失敗數、總/平均/p95/最大耗時、佔總耗時比例、平均每千根K線耗時、
+    平均內存峰值 (KB)；按總耗時從大到小排列，用來找出拖慢批量分析的方法
+    :param timings: analyze_watchlist(..., with_timings=True) 返回的耗時記錄
+    """
+    summary = timings.assign(
+        failed=timings['status'] != 'ok',
+        ms_per_kbar=timings['seconds'] * 1e6 / timings['bars'].where(timings['bars'] > 0),
+    ).groupby('method', sort=False).agg(
+        tickers=('ticker', 'nunique'),
+        errors=('failed', 'sum'),
+        total_s=('seconds', 'sum'),
+        mean_s=('seconds', 'mean'),
+        p95_s=('seconds', lambda s: s.quantile(0.95)),
+        max_s=('seconds', 'max'),
+        ms_per_kbar=('ms_per_kbar', 'mean'),
+        peak_kb=('peak_kb', 'mean'),
+    )
+    summary.insert(3, 'share', summary['total_s'] / summary['total_s'].sum())
+    return summary.sort_values('total_s', ascending=False)
+
+
+if __name__ == "__main__":
+    # 用法: python sr_batch.py [代碼... | watchlist.csv]
+    WATCHLIST = sys.argv[1:] or ['icct', 'mspr', 'bjdx', 'aapl']
+    if len(WATCHLIST) == 1 and os.path.isfile(WATCHLIST[0]):
+        WATCHLIST = WATCHLIST[0]
+
+    started = time.perf_counter()
+    levels, timings = analyze_watchlist(WATCHLIST, period='5d', interval='1m', profile='split',
+                                        with_timings=True)
+    print(summarize(levels).to_string())
+    print("\n⏱ 各方法耗時 (SR_TRACEMALLOC=1 時顯示內存峰值):")
+    print(summarize_methods(timings).round(4).to_string())
+    print(f"\n共 {levels['ticker'].nunique()} 隻股票，耗時 {time.perf_counter() - started:.1f} 秒")
+
+    output = f"sr_levels_{time.strftime('%Y%m%d_%H%M')}.csv"
+    levels.to_csv(output, index=False)
+    print(f"結果已保存到 {output}")
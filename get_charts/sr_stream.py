@@ -0,0 +1,500 @@
+import bisect
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from sr_analyzer import (
+    AUTO_WINDOWS, fibonacci_from_range, pivot_indices, format_pivots,
+    profile_edges, select_profile_levels
+)
+from levels import mean_group_starts
+from volume_profile import volume_at_price
+from trendlines import rolling_linregress, rolling_theil_sen, last_valid
+from indicators import true_range, session_ids, session_mask
+
+# 非中心窗口方法 (find_peaks) 每次更新重算的尾部長度
+PEAKS_LOOKBACK = 120
+
+
+class PivotClusters:
+    """
+    按價格排序的樞軸價格及其 mean 分組 (與 cluster_levels 的結果相同)
+    加入或刪除一個價格時只從受影響的組開始重新分組，分組邊界與原來重合後即停止
+    """
+
+    def __init__(self, values, threshold):
+        self.threshold = threshold
+        self.eps = 1e-9 * max(threshold, 1.0)
+        self.values = sorted(values)
+        self.starts = mean_group_starts(self.values, threshold).tolist() if self.values else []
+        self.levels = [self._level(a, b) for a, b in zip(self.starts, self.starts[1:] + [len(self.values)])]
+
+    def _level(self, a, b):
+        # 與 merge_levels 相同的求和方式 (np.add.reduceat)
+        return float(round(np.add.reduceat(np.asarray(self.values[a:b]), [0])[0] / (b - a), 2))
+
+    def add(self, value):
+        pos = bisect.bisect_right(self.values, value)
+        self.values.insert(pos, value)
+        old = [start + (start >= pos and start > 0) for start in self.starts]
+        self._regroup(pos, old, pos + 1)
+
+    def remove(self, value):
+        pos = bisect.bisect_left(self.values, value)
+        del self.values[pos]
+        old = [start - (start > pos) for start in self.starts if start != pos]
+        if self.values and (not old or old[0] != 0):
+            old.insert(0, 0)
+        self._regroup(pos, old, pos)
+
+    def _regroup(self, pos, old, settled):
+        """
+        :param old: 原分組起點 (已按插入/刪除平移)
+        :param settled: 從這個位置起，與原分組重合的起點之後的分組不變
+        """
+        n = len(self.values)
+        if n == 0:
+            self.starts, self.levels = [], []
+            return
+        # 分組按價格順序逐個決定: pos 所在組 (或前一組) 之前的分組不受影響
+        g = max(bisect.bisect_right(old, max(pos - 1, 0)) - 1, 0)
+        starts = old[:g] + [old[g] if g < len(old) else 0]
+        old_set = {start: k for k, start in enumerate(old)}
+        total, count = self.values[starts[-1]], 1
+        stop = None
+        for i in range(starts[-1] + 1, n):
+            x = self.values[i]
+            deviation = abs(x - total / count)
+            if abs(deviation - self.threshold) <= self.eps:
+                # 閾值附近按 np.mean 重算，與 mean_group_starts 一致
+                deviation = abs(x - np.mean(self.values[starts[-1]:i]))
+            if deviation > self.threshold:
+                if i >= settled and i in old_set:
+                    stop = old_set[i]
+                    break
+                starts.append(i)
+                total, count = x, 1
+            else:
+                total += x
+                count += 1
+
+        tail = old[stop:] if stop is not None else []
+        changed = starts + tail
+        ends = changed[1:] + [n]
+        # 只重算重新分組範圍內的水平，其餘沿用
+        kept_tail = self.levels[len(self.levels) - len(tail):] if tail else []
+        self.levels = (self.levels[:g]
+                       + [self._level(a, b) for a, b in zip(starts[g:], ends[g:len(starts)])]
+                       + kept_tail)
+        self.starts = changed
+
+
+class StreamingState:
+    """
+    逐根K線增量更新的支撐阻力狀態
+    以現有歷史初始化一次 (O(history))，之後每根新K線只處理尾部窗口 (O(window))；
+    peaks 模式的樞軸合併只重算受影響的組，centered (閾值相對全部樞軸均價) 與 rolling
+    (返回全部不重複樞軸) 每次按全部樞軸整理
+    窗口、分箱步長與聚類數在初始化時固定，直到下次 run_all_analysis 重算
+
+    近似: peaks 模式只在最後 PEAKS_LOOKBACK 根K線上重算 find_peaks，prominence 不考慮更早的K線，
+    較早樞軸的 prominence 也不會隨新K線更新，所以樞軸集合可能與完整重算不同
+    (其他方法與完整重算一致，KMeans 為在線更新的近似，使用與完整計算相同的 columns / weighted)
+    """
+
+    def __init__(self, features, params, results):
+        self.params = params
+        n = len(features)
+        self.count = n
+        self.windows = self._resolve_windows(n)
+        self.maxlen = max([PEAKS_LOOKBACK if self._pivot_style() == 'peaks' else 0]
+                          + [w * 2 + 1 for w in self.windows.values()] + [6])
+
+        tail = slice(max(0, n - self.maxlen), n)
+        self.high = deque(features.high[tail], maxlen=self.maxlen)
+        self.low = deque(features.low[tail], maxlen=self.maxlen)
+        self.close = deque(features.close[tail], maxlen=self.maxlen)
+        self.volume = deque(features.volume[tail], maxlen=self.maxlen)
+
+        self._seed_fibonacci(features)
+        self._seed_vwap(features)
+        if 'Pivot Points' in params:
+            self._seed_pivots(features)
+        if 'Volume Profile' in params:
+            self._seed_volume_profile(features)
+        if 'KMeans Clusters' in params:
+            self._seed_kmeans(features, results.get('KMeans Clusters'))
+        if self._trendline_style() == 'theil_sen':
+            self._seed_theil_sen(features)
+
+    def _pivot_style(self):
+        return self.params.get('Pivot Points', {}).get('style', 'peaks')
+
+    def _trendline_style(self):
+        if 'Trendlines' not in self.params:
+            return None
+        return self.params['Trendlines'].get('style', 'ols')
+
+    def _resolve_windows(self, n):
+        windows = {}
+        for name in ('Bollinger Bands', 'Smart Money', 'Trendlines', 'Pivot Points'):
+            if name not in self.params:
+                continue
+            window = self.params[name].get('window')
+            if window is None:
+                if name == 'Pivot Points' and self._pivot_style() != 'rolling':
+                    window = 10
+                elif name == 'Trendlines' and self._trendline_style() == 'theil_sen':
+                    window = 20
+                else:
+                    window = AUTO_WINDOWS[name](n)
+            windows[name] = window
+        return windows
+
+    def _tail(self, buffer, length):
+        values = np.fromiter(buffer, dtype=np.float64, count=len(buffer))
+        return values[-length:] if length else values
+
+    # 斐波那契: 全局高低點 / ATR 過濾波段
+    def _seed_fibonacci(self, f):
+        self.max_high = np.nanmax(f.high) if len(f) else np.nan
+        self.min_low = np.nanmin(f.low) if len(f) else np.nan
+        ranges = f.high - f.low
+        self.range_sum = float(np.nansum(ranges))
+        self.range_count = int(np.isfinite(ranges).sum())
+
+        self.atr_multiplier = self.params.get('Fibonacci', {}).get('atr_multiplier')
+        self.atr_window = self.params.get('Fibonacci', {}).get('atr_window')
+        self._seed_atr(f)
+        self.swing_high = self.swing_low = None
+        self.prev_high5 = self.prev_low5 = np.nan
+        if self.atr_multiplier is None or len(f) < 5:
+            return
+        highs = f.rolling_max('high', 5)
+        lows = f.rolling_min('low', 5)
+        atr = f.mean_range() if self.atr_window is None else f.atr(self.atr_window)
+        valid_highs = highs[np.diff(highs, prepend=np.nan) > atr * self.atr_multiplier]
+        valid_lows = lows[np.diff(lows, prepend=np.nan) < -atr * self.atr_multiplier]
+        self.swing_high = valid_highs.max() if len(valid_highs) else None
+        self.swing_low = valid_lows.min() if len(valid_lows) else None
+        self.prev_high5, self.prev_low5 = highs[-1], lows[-1]
+
+    def _seed_atr(self, f):
+        """Wilder ATR 的狀態: 最後一個 ATR、前收市價，不足窗口時累計真實波幅"""
+        if self.atr_window is None:
+            return
+        tr = true_range(f.high, f.low, f.close)
+        tr = tr[np.isfinite(tr)]
+        self.tr_count = len(tr)
+        self.tr_sum = float(tr[:self.atr_window].sum())
+        self.atr_value = last_valid(f.atr(self.atr_window))
+        self.prev_close = f.close[-1] if len(f) else np.nan
+
+    def _update_atr(self, high, low, close):
+        tr = np.fmax(high - low, np.fmax(abs(high - self.prev_close), abs(low - self.prev_close)))
+        self.prev_close = close
+        if not np.isfinite(tr):
+            return self.atr_value
+        self.tr_count += 1
+        if self.tr_count <= self.atr_window:
+            self.tr_sum += tr
+            if self.tr_count == self.atr_window:
+                self.atr_value = self.tr_sum / self.atr_window
+        else:
+            self.atr_value += (tr - self.atr_value) / self.atr_window
+        return self.atr_value
+
+    def _update_fibonacci(self, high, low, close):
+        self.max_high = np.fmax(self.max_high, high)
+        self.min_low = np.fmin(self.min_low, low)
+        if np.isfinite(high - low):
+            self.range_sum += high - low
+            self.range_count += 1
+        if self.atr_window is not None:
+            atr = self._update_atr(high, low, close)
+        else:
+            atr = self.range_sum / max(self.range_count, 1)
+
+        if self.atr_multiplier is not None and len(self.high) >= 5 and atr is not None:
+            high5 = self._tail(self.high, 5).max()
+            low5 = self._tail(self.low, 5).min()
+            if high5 - self.prev_high5 > atr * self.atr_multiplier:
+                self.swing_high = high5 if self.swing_high is None else max(self.swing_high, high5)
+            if low5 - self.prev_low5 < -atr * self.atr_multiplier:
+                self.swing_low = low5 if self.swing_low is None else min(self.swing_low, low5)
+            self.prev_high5, self.prev_low5 = high5, low5
+
+        high = self.swing_high if self.swing_high is not None else self.max_high
+        low = self.swing_low if self.swing_low is not None else self.min_low
+        return fibonacci_from_range(high, low)
+
+    # VWAP 累積和 (按 Smart Money 的參數，預設每個交易日重新累積)
+    def _seed_vwap(self, f):
+        params = self.params.get('Smart Money', {})
+        self.vwap_session = params.get('session', True)
+        self.vwap_prepost = params.get('prepost', True)
+        self.vwap_day = None
+        take = np.ones(len(f), dtype=bool)
+        if self.vwap_session and len(f):
+            days = session_ids(f.index)
+            self.vwap_day = days[-1]
+            take &= days == self.vwap_day
+        if not self.vwap_prepost:
+            take &= np.asarray(session_mask(f.index, prepost=False), dtype=bool)
+        typical = (f.high + f.low + f.close) / 3
+        self.cum_pv = float(np.nansum((f.volume * typical)[take]))
+        self.cum_v = float(np.nansum(np.where(np.isnan(typical), np.nan, f.volume)[take]))
+
+    def _update_vwap(self, high, low, close, volume, timestamp):
+        if timestamp is not None:
+            index = pd.DatetimeIndex([timestamp])
+            if self.vwap_session:
+                day = session_ids(index)[0]
+                if day != self.vwap_day:
+                    self.vwap_day = day
+                    self.cum_pv = self.cum_v = 0.0
+            if not self.vwap_prepost and not session_mask(index, prepost=False)[0]:
+                return
+        if np.isfinite(volume) and np.isfinite(high + low + close):
+            self.cum_pv += volume * (high + low + close) / 3
+            self.cum_v += volume
+
+    @property
+    def vwap(self):
+        return self.cum_pv / self.cum_v if self.cum_v else np.nan
+
+    # 樞軸點: 保留歷史樞軸，只重算尾部
+    def _seed_pivots(self, f):
+        params = self.params['Pivot Points']
+        self.pivot_window = self.windows['Pivot Points']
+        self.prominence = params.get('prominence', 0.1)
+        res_idx, res_val, sup_idx, sup_val = pivot_indices(
+            f.high, f.low, self._pivot_style(), self.pivot_window, self.prominence)
+        # 位置 -> 價格，鍵按時間順序 (只在尾部刪除與追加)
+        self.resistance_pivots = dict(zip(res_idx.tolist(), res_val.tolist()))
+        self.support_pivots = dict(zip(sup_idx.tolist(), sup_val.tolist()))
+        self.pivot_clusters = None
+        if self._pivot_style() == 'peaks':
+            threshold = params.get('threshold', 0.02)
+            self.pivot_clusters = (PivotClusters(res_val.tolist(), threshold),
+                                   PivotClusters(sup_val.tolist(), threshold))
+
+    def _update_pivots(self):
+        params = self.params['Pivot Points']
+        style = self._pivot_style()
+        offset = self.count - len(self.high)
+        # 中心窗口只有最後 window 根會受新K線影響；find_peaks 重算整個尾部
+        stable = 0 if style == 'peaks' else len(self.high) - self.pivot_window * 2
+        region_start = offset + max(stable, 0)
+
+        res_idx, res_val, sup_idx, sup_val = pivot_indices(
+            self._tail(self.high, 0), self._tail(self.low, 0),
+            style, self.pivot_window, self.prominence)
+        sides = ((self.resistance_pivots, res_idx, res_val), (self.support_pivots, sup_idx, sup_val))
+        for k, (pivots, idx, val) in enumerate(sides):
+            fresh = {i: v for i, v in zip((idx + offset).tolist(), val.tolist()) if i >= region_start}
+            # 鍵按時間順序，受影響的樞軸都在尾部
+            stale = {}
+            while pivots and next(reversed(pivots)) >= region_start:
+                key, value = pivots.popitem()
+                stale[key] = value
+            pivots.update(fresh)
+            if self.pivot_clusters is not None:
+                clusters = self.pivot_clusters[k]
+                for key, value in stale.items():
+                    if fresh.get(key) != value:
+                        clusters.remove(value)
+                for key, value in fresh.items():
+                    if stale.get(key) != value:
+                        clusters.add(value)
+
+        if self.pivot_clusters is not None:
+            resistance, support = self.pivot_clusters
+            return {'Support': list(support.levels), 'Resistance': list(resistance.levels)}
+        resistance = np.fromiter(self.resistance_pivots.values(), dtype=np.float64)
+        support = np.fromiter(self.support_pivots.values(), dtype=np.float64)
+        return format_pivots(resistance, support, style, params.get('threshold', 0.02))
+
+    # 成交量分布: 固定區間的直方圖，新價格超出範圍時按步長擴展
+    def _seed_volume_profile(self, f):
+        params = self.params['Volume Profile']
+        self.profile_style = params.get('style', 'percentile')
+        self.profile_mode = params.get('mode', 'range')
+        try:
+            self.edges = profile_edges(
+                np.nanmin(f.low), np.nanmax(f.high), len(f), self.profile_style,
+                params.get('bins', 20), params.get('price_step', 0.5))
+        except ValueError:
+            self.edges = None
+            return
+        if len(self.edges) < 2:
+            self.edges = None
+            return
+        self.step = self.edges[1] - self.edges[0]
+        self.profile = volume_at_price(f.high, f.low, f.close, f.volume,
+                                       self.edges, mode=self.profile_mode)
+
+    def _extend_edges(self, low, high):
+        if low < self.edges[0]:
+            k = int(np.ceil((self.edges[0] - low) / self.step))
+            self.edges = np.concatenate((self.edges[0] - self.step * np.arange(k, 0, -1), self.edges))
+            self.profile = np.concatenate((np.zeros(k), self.profile))
+        if high > self.edges[-1]:
+            k = int(np.ceil((high - self.edges[-1]) / self.step))
+            self.edges = np.concatenate((self.edges, self.edges[-1] + self.step * np.arange(1, k + 1)))
+            self.profile = np.concatenate((self.profile, np.zeros(k)))
+
+    def _update_volume_profile(self, high, low, close, volume):
+        if self.edges is None:
+            return None
+        price_min, price_max = np.nanmin([low, close]), np.nanmax([high, close])
+        if np.isfinite(price_min) and np.isfinite(price_max) and np.isfinite(volume):
+            self._extend_edges(price_min, price_max)
+            # 只處理這根K線覆蓋的區間 (前後各多留一個區間)
+            n_bins = len(self.profile)
+            first = max(np.searchsorted(self.edges, price_min, side='left') - 2, 0)
+            last = min(np.searchsorted(self.edges, price_max, side='right') + 1, n_bins)
+            self.profile[first:last] += volume_at_price(
+                [high], [low], [close], [volume], self.edges[first:last + 1], mode=self.profile_mode)
+        return select_profile_levels(self.edges, self.profile, self.profile_style)
+
+    # KMeans: 以批量結果為初始中心的在線 (MacQueen) 更新
+    def _seed_kmeans(self, f, levels):
+        # 與完整計算一樣把 columns 的價格合併聚類 (split 為 high/low/close)，weighted 時按成交量加權
+        self.centroids = None
+        if not isinstance(levels, list) or not levels:
+            return
+        params = self.params['KMeans Clusters']
+        self.kmeans_columns = tuple(params.get('columns', ('close',)))
+        self.kmeans_weighted = params.get('weighted', False)
+        self.centroids = np.array(levels, dtype=np.float64)
+        prices = np.concatenate([f.array(c) for c in self.kmeans_columns])
+        weights = np.tile(f.volume, len(self.kmeans_columns)) if self.kmeans_weighted else np.ones(len(prices))
+        ok = np.isfinite(prices) & np.isfinite(weights)
+        nearest = np.abs(prices[ok][:, None] - self.centroids[None, :]).argmin(axis=1)
+        self.centroid_counts = np.bincount(nearest, weights=weights[ok], minlength=len(self.centroids))
+
+    def _update_kmeans(self, bar):
+        """:param bar: {'high', 'low', 'close', 'volume'}"""
+        if self.centroids is None:
+            return None
+        weight = bar['volume'] if self.kmeans_weighted else 1.0
+        for column in self.kmeans_columns:
+            price = bar[column]
+            if not np.isfinite(price) or not weight > 0:
+                continue
+            j = np.abs(self.centroids - price).argmin()
+            self.centroid_counts[j] += weight
+            self.centroids[j] += weight * (price - self.centroids[j]) / self.centroid_counts[j]
+        return sorted(float(c) for c in self.centroids)
+
+    # 趨勢線: 只重算最新窗口
+    def _seed_theil_sen(self, f):
+        self.valid_support = deque(maxlen=3)
+        self.valid_resistance = deque(maxlen=3)
+        window = self.windows['Trendlines']
+        n = len(f)
+        if n < window + 1:
+            return
+        ends = np.arange(max(window - 1, n - 1 - window), n - 1)
+        for values, side in ((f.low, 'support'), (f.high, 'resistance')):
+            slope, intercept = rolling_theil_sen(values, window, ends=ends)
+            for s, b in zip(slope, intercept):
+                self._push_theil_sen(side, s, b, window)
+
+    def _push_theil_sen(self, side, slope, intercept, window):
+        angle_threshold = self.params['Trendlines'].get('angle_threshold', 5)
+        if not np.isfinite(slope) or abs(np.degrees(np.arctan(slope))) <= angle_threshold:
+            return
+        if side == 'support' and slope < 0:
+            self.valid_support.append(intercept + slope * (window - 1))
+        elif side == 'resistance' and slope > 0:
+            self.valid_resistance.append(intercept + slope * (window - 1))
+
+    def _update_trendlines(self):
+        window = self.windows['Trendlines']
+        if len(self.low) < window + 1:
+            return None
+        # 與批量計算一致: 以前 window 根 (不含最新一根) 擬合
+        lows = self._tail(self.low, window + 1)[:-1]
+        highs = self._tail(self.high, window + 1)[:-1]
+
+        if self._trendline_style() == 'ols':
+            slope, intercept = rolling_linregress(lows, window)
+            support = last_valid(intercept + slope * (window - 1))
+            slope, intercept = rolling_linregress(highs, window)
+            resistance = last_valid(intercept + slope * (window - 1))
+            if support is None or resistance is None:
+                return None
+            return {'Current Support': support, 'Current Resistance': resistance}
+
+        slope, intercept = rolling_theil_sen(lows, window)
+        self._push_theil_sen('support', slope[-1], intercept[-1], window)
+        slope, intercept = rolling_theil_sen(highs, window)
+        self._push_theil_sen('resistance', slope[-1], intercept[-1], window)
+        return {
+            'Current Support': np.mean(self.valid_support) if self.valid_support else None,
+            'Current Resistance': np.mean(self.valid_resistance) if self.valid_resistance else None
+        }
+
+    def _update_bollinger(self):
+        params = self.params['Bollinger Bands']
+        window = self.windows['Bollinger Bands']
+        if self.count < window:
+            return None
+        recent = self._tail(self.close, window)
+        middle = np.mean(recent)
+        std = np.std(recent, ddof=1)
+        upper = middle + std * params.get('std_dev', 2)
+        lower = middle - std * params.get('std_dev', 2)
+        if params.get('style', 'levels') == 'bands':
+            return {'Upper': upper, 'Middle': middle, 'Lower': lower}
+        return {'Support': lower, 'Resistance': upper}
+
+    def _update_smart_money(self):
+        window = self.windows['Smart Money']
+        if self.count < max(window, 5):
+            return None
+        support = np.min(self._tail(self.low, window))
+        resistance = np.max(self._tail(self.high, window))
+        if not np.isfinite(support) or not np.isfinite(resistance):
+            return None
+        return {'Support': float(support), 'Resistance': float(resistance)}
+
+    def update(self, high, low, close, volume, timestamp=None):
+        """
+        加入一根新K線
+        :param timestamp: K線時間，用於判斷 VWAP 是否進入新的交易日
+        :return: 更新後各方法的結果 (無法增量計算的方法不包含在內)
+        """
+        self.high.append(high)
+        self.low.append(low)
+        self.close.append(close)
+        self.volume.append(volume)
+        self.count += 1
+        self._update_vwap(high, low, close, volume, timestamp)
+
+        updates = {}
+        if 'Fibonacci' in self.params:
+            updates['Fibonacci'] = self._update_fibonacci(high, low, close)
+        if 'Pivot Points' in self.params:
+            try:
+                updates['Pivot Points'] = self._update_pivots()
+            except ValueError:
+                pass
+        if 'Bollinger Bands' in self.params:
+            updates['Bollinger Bands'] = self._update_bollinger()
+        if 'KMeans Clusters' in self.params:
+            updates['KMeans Clusters'] = self._update_kmeans(
+                dict(high=high, low=low, close=close, volume=volume))
+        if 'Volume Profile' in self.params:
+            try:
+                updates['Volume Profile'] = self._update_volume_profile(high, low, close, volume)
+            except ValueError:
+                pass
+        if 'Trendlines' in self.params:
+            updates['Trendlines'] = self._update_trendlines()
+        if 'Smart Money' in self.params:
+            updates['Smart Money'] = self._update_smart_money()
+        return {name: value for name, value in updates.items() if value is not None}
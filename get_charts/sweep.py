@@ -0,0 +1,160 @@
+import inspect
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import run_backtest, load_history, SUMMARY_KEYS
+from sr_analyzer import METHODS
+
+# summarize_backtest 輸出的統計欄
+SUMMARY_METRICS = ['levels', 'touches', 'bounces', 'breaks', 'touch_bars', 'resolve_bars',
+                   'touch_rate', 'bounce_rate', 'break_rate']
+
+# 各腳本中寫死的參數及常用取值，鍵為 '方法名.參數名'
+PARAM_SPACE = {
+    'Pivot Points.prominence': [0.05, 0.1, 0.2, 0.3],
+    'Pivot Points.threshold': [0.01, 0.02, 0.05],
+    'Bollinger Bands.window': [10, 20, 30],
+    'KMeans Clusters.n_clusters': [3, 5, 8],
+    'Volume Profile.bins': [10, 20, 40],
+}
+
+
+def parameter_grid(space):
+    """全部組合，每個組合為 {'方法名.參數名': 值}"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_combinations(space, n, seed=None):
+    """隨機抽取 n 個不重複的組合 (組合總數不足 n 時返回全部)"""
+    rng = np.random.default_rng(seed)
+    keys = list(space)
+    sizes = [len(space[k]) for k in keys]
+    total = int(np.prod(sizes))
+    picks = rng.choice(total, size=min(n, total), replace=False)
+    # 組合序號按各參數的取值數展開為每個參數的取值位置
+    positions = np.array(np.unravel_index(picks, sizes)).T
+    return [{k: space[k][i] for k, i in zip(keys, row)} for row in positions]
+
+
+def validate_space(space):
+    """
+    檢查每個 '方法名.參數名' 都存在: 拼錯時每個窗口的方法都會失敗，結果表中該方法沒有任何記錄，
+    各組合的排名看起來完全相同
+    """
+    for key in space:
+        method, sep, name = key.rpartition('.')
+        if not sep:
+            raise ValueError(f"Search space key must be 'method.param': {key}")
+        if method not in METHODS:
+            raise ValueError(f"Unknown analysis method in search space: {method}")
+        # 第一個參數為 FeatureCache
+        accepted = list(inspect.signature(METHODS[method]['func']).parameters)[1:]
+        if name not in accepted:
+            raise ValueError(f"Unknown parameter for {method}: {name} (expected one of {', '.join(accepted)})")
+
+
+def combo_params(combo):
+    """{'方法名.參數名': 值} -> SupportResistanceAnalyzer 的 params"""
+    params = {}
+    for key, value in combo.items():
+        method, name = key.rsplit('.', 1)
+        params.setdefault(method, {})[name] = value
+    return params
+
+
+def run_sweep(frames, space=None, profile='split', search='grid', n_iter=20, seed=0, output=None,
+              **options):
+    """
+    參數掃描: 所有組合在同一次滾動回測中評估 (同一窗口共用特徵與相同參數的方法結果)，按股票並行
+    :param frames: {ticker: DataFrame}，見 backtest.load_history
+    :param space: {'方法名.參數名': [取值...]}，預設 PARAM_SPACE
+    :param search: grid - 全部組合；random - 隨機抽取 n_iter 個
+    :param output: 結果保存路徑 (.parquet 或 .csv)
+    :param options: 傳給 backtest.run_backtest (lookback, step, horizon, max_workers ...)
+    :return: 每個 (組合, 股票, 方法) 一行的列式結果表，含參數欄與回測統計，用 rank_combinations 排名
+    """
+    space = space or PARAM_SPACE
+    validate_space(space)
+    if search == 'grid':
+        combos = parameter_grid(space)
+    elif search == 'random':
+        combos = random_combinations(space, n_iter, seed)
+    else:
+        raise ValueError(f"Unknown search: {search}")
+
+    names = [f"c{i:04d}" for i in range(len(combos))]
+    configs = {name: {'profile': profile, 'params': combo_params(combo)}
+               for name, combo in zip(names, combos)}
+    summary = run_backtest(frames, configs=configs, summarize=True, **options)
+
+    params = pd.DataFrame(combos, index=pd.Index(names, name='config')).reset_index()
+    table = params.merge(summary.astype({'config': str}), on='config', how='right')
+    table = table[['config'] + list(space) + [c for c in summary.columns if c != 'config']]
+
+    if output:
+        if output.endswith('.csv'):
+            table.to_csv(output, index=False)
+        else:
+            table.to_parquet(output, index=False)
+    return table
+
+
+def rank_combinations(table, metric='bounce_rate', methods=None, min_touches=30):
+    """
+    各股票的統計合併後按 metric 排名
+    :param methods: 只統計這些方法的水平 (如 ['Pivot Points'])，None 為全部
+    :param min_touches: 觸及次數少於此數的組合不參與排名
+    :return: 每個組合一行，metric 高的在前
+    """
+    if methods is not None:
+        table = table[table['method'].isin(methods)]
+    param_columns = [c for c in table.columns if c not in SUMMARY_KEYS + SUMMARY_METRICS]
+    resolved = table['bounces'] + table['breaks']
+    ranked = table.assign(
+        touch_total=table['touch_bars'].fillna(0) * table['touches'],
+        resolve_total=table['resolve_bars'].fillna(0) * resolved,
+        resolved=resolved,
+    ).groupby(['config'] + param_columns, sort=False, dropna=False).agg(
+        tickers=('ticker', 'nunique'),
+        levels=('levels', 'sum'),
+        touches=('touches', 'sum'),
+        bounces=('bounces', 'sum'),
+        breaks=('breaks', 'sum'),
+        touch_total=('touch_total', 'sum'),
+        resolve_total=('resolve_total', 'sum'),
+        resolved=('resolved', 'sum'),
+    ).reset_index()
+
+    touches = ranked['touches'].where(ranked['touches'] > 0)
+    ranked['touch_rate'] = ranked['touches'] / ranked['levels']
+    ranked['bounce_rate'] = ranked['bounces'] / touches
+    ranked['break_rate'] = ranked['breaks'] / touches
+    ranked['touch_bars'] = ranked['touch_total'] / touches
+    ranked['resolve_bars'] = ranked['resolve_total'] / ranked['resolved'].where(ranked['resolved'] > 0)
+    ranked = ranked.drop(columns=['touch_total', 'resolve_total', 'resolved'])
+    ranked = ranked[ranked['touches'] >= min_touches]
+    return ranked.sort_values(metric, ascending=False, kind='stable').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # 用法: python sweep.py [組合數] [代碼...]
+    # 用本地緩存的 1 分鐘K線隨機抽取參數組合，按樞軸點的反彈率排名
+    N_ITER = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    WATCHLIST = sys.argv[2:] or ['icct', 'mspr', 'bjdx', 'aapl']
+
+    frames = load_history(WATCHLIST, days=20)
+    if not frames:
+        print("沒有本地緩存的K線 (sr_batch.py / timeframes.py 讀取 1 分鐘K線時會自動緩存)")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    output = f"sweep_{time.strftime('%Y%m%d_%H%M')}.parquet"
+    table = run_sweep(frames, search='random', n_iter=N_ITER, output=output)
+    print(rank_combinations(table, methods=['Pivot Points']).head(10).round(3).to_string(index=False))
+    print(f"\n{N_ITER} 個組合，耗時 {time.perf_counter() - started:.1f} 秒，結果已保存到 {os.path.abspath(output)}")
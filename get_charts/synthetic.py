@@ -0,0 +1,97 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from market_data import ET_TZ
+from indicators import EXTENDED_SESSION, REGULAR_SESSION, session_mask
+
+# 固定的起始交易日，同一 seed 每次生成相同的K線
+START_DATE = '2025-01-02'
+
+
+def tick_size(price):
+    """美股最小報價單位: $1 以下 $0.0001，$1 及以上 $0.01"""
+    return np.where(price < 1.0, 0.0001, 0.01)
+
+
+def round_to_tick(price):
+    tick = tick_size(price)
+    return np.maximum(np.round(np.round(price / tick) * tick, 4), 0.0001)
+
+
+def _session_minutes(day, prepost):
+    start, end = EXTENDED_SESSION if prepost else REGULAR_SESSION
+    return pd.date_range(f"{day:%Y-%m-%d} {start}", f"{day:%Y-%m-%d} {end}", freq='1min', inclusive='left')
+
+
+def synthetic_ohlcv(days=1, seed=0, start_price=0.8, prepost=True, daily_vol=0.12,
+                    gap_vol=0.08, halt_prob=0.3, spike_prob=0.002, extended_fill=0.35):
+    """
+    模擬低價股的 1 分鐘K線 (離線基準測試與示例用)
+    - 價格為對數隨機遊走，按 $1 上下的最小報價單位取整 (低於 $1 時為 $0.0001)
+    - 每天開盤前有隔夜跳空；少數K線有新聞式跳動，同時成交量放大 10-50 倍
+    - 正常時段每天以 halt_prob 的概率出現一次 5-10 分鐘停牌 (沒有K線)，復牌時跳空
+    - 盤前盤後只有 extended_fill 比例的分鐘有成交，成交量較小；正常時段成交量呈 U 形
+    :param days: 交易日數 (從 START_DATE 起的工作日)
+    :return: open/high/low/close/volume，美東時間索引 (名稱 Datetime)
+    """
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(START_DATE, periods=days)
+    index = pd.DatetimeIndex(np.concatenate([_session_minutes(d, prepost).values for d in sessions]))
+    regular = np.asarray(session_mask(index, prepost=False))
+    day_of = np.repeat(np.arange(days), len(index) // days)
+
+    # 成交分鐘: 盤前盤後稀疏，正常時段幾乎每分鐘都有
+    traded = np.where(regular, rng.random(len(index)) < 0.97, rng.random(len(index)) < extended_fill)
+    # 停牌: 正常時段內隨機一段時間沒有K線
+    halted = np.zeros(len(index), dtype=bool)
+    resume = np.zeros(len(index), dtype=bool)
+    for d in range(days):
+        if rng.random() < halt_prob:
+            bars = np.flatnonzero(regular & (day_of == d))
+            start = bars[rng.integers(30, len(bars) - 30)]
+            length = int(rng.integers(5, 11))
+            halted[start:start + length] = True
+            resume[start + length] = True
+    keep = (traded | resume) & ~halted
+    index, regular, day_of, resume = index[keep], regular[keep], day_of[keep], resume[keep]
+    n = len(index)
+
+    # 每分鐘的對數收益: 正常時段波動較大，盤前盤後較小
+    step_vol = daily_vol / np.sqrt(390)
+    returns = rng.standard_t(4, n) * step_vol * np.where(regular, 1.0, 0.6)
+    session_open = np.r_[True, day_of[1:] != day_of[:-1]]
+    returns[session_open] += rng.normal(0, gap_vol, session_open.sum())
+    returns[resume] += rng.normal(0, 0.06, resume.sum())
+    spikes = rng.random(n) < spike_prob
+    returns[spikes] += rng.normal(0, 0.05, spikes.sum())
+    close = round_to_tick(start_price * np.exp(np.cumsum(returns)))
+
+    gap = session_open | resume
+    open_ = np.r_[round_to_tick(start_price), close[:-1]]
+    open_[gap] = round_to_tick(open_[gap] * np.exp(returns[gap] * rng.uniform(0.5, 1.0, gap.sum())))
+    wick = np.abs(rng.normal(0, step_vol * 0.5, (2, n))) * close
+    high = np.maximum(round_to_tick(np.maximum(open_, close) + wick[0]), np.maximum(open_, close))
+    low = np.minimum(round_to_tick(np.minimum(open_, close) - wick[1]), np.minimum(open_, close))
+
+    # U 形成交量 (開盤與收盤較大)，跳空與新聞K線放量
+    start_min = int(REGULAR_SESSION[0][:2]) * 60 + int(REGULAR_SESSION[0][3:])
+    hours = (index.hour * 60 + index.minute - start_min).to_numpy() / 390.0
+    shape = np.where(regular, 1.0 + 12.0 * (hours - 0.5) ** 2, 0.15)
+    volume = rng.lognormal(np.log(20000), 1.0, n) * shape
+    volume[spikes | gap] *= rng.uniform(10, 50, (spikes | gap).sum())
+
+    df = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close,
+                       'volume': np.round(volume)}, index=index.tz_localize(ET_TZ))
+    df.index.name = 'Datetime'
+    return df
+
+
+if __name__ == "__main__":
+    # 用法: python synthetic.py [天數] [seed]
+    DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    SEED = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    df = synthetic_ohlcv(DAYS, seed=SEED)
+    print(df.head(10).to_string())
+    print(f"\n{len(df)} 根K線，{df.index[0]} 至 {df.index[-1]}，價格 {df['low'].min():.4f} - {df['high'].max():.4f}")
@@ -0,0 +1,122 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_cached_ohlcv
+from market_data import MAX_LOOKBACK_DAYS, period_days
+from levels import merge_levels
+from sr_analyzer import SupportResistanceAnalyzer
+from sr_batch import results_to_rows
+from indicators import session_mask
+
+# 週期名稱 -> pandas 頻率
+TIMEFRAMES = {'1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min',
+              '1h': '60min', '1d': '1D'}
+# 小時K線與 Yahoo 一致，從 9:30 起算
+TIMEFRAME_OFFSETS = {'1h': '30min'}
+# 各週期水平在綜合評分中的權重，週期越長越重要
+TIMEFRAME_WEIGHTS = {'1m': 1.0, '2m': 1.0, '5m': 1.5, '15m': 2.0, '30m': 2.5, '1h': 3.0, '1d': 4.0}
+
+
+def resample_ohlcv(df, timeframe, prepost=True):
+    """
+    由較短週期的K線合成 timeframe 週期
+    日線按 Yahoo 的做法只使用正常交易時段；日內週期按 prepost 決定是否包含盤前盤後
+    :return: 相同欄位的 DataFrame，沒有成交的時間段不產生K線
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    if df.empty:
+        return df
+
+    daily = timeframe == '1d'
+    df = df[session_mask(df.index, prepost=prepost and not daily)]
+    bars = df.resample(TIMEFRAMES[timeframe], label='left', closed='left',
+                       offset=TIMEFRAME_OFFSETS.get(timeframe)).agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+    bars = bars.dropna(subset=['open'])
+    bars.index.name = df.index.name
+    return bars
+
+
+def load_timeframes(ticker, timeframes=('5m', '15m', '1h', '1d'), days=5, prepost=True, base=None):
+    """
+    只讀取一次 1 分鐘K線 (本地緩存 + 增量下載)，合成所有週期
+    :param base: 已有的 1 分鐘K線，提供時不再讀取
+    :return: {週期: DataFrame}
+    """
+    if base is None:
+        base = get_cached_ohlcv(ticker, period=f"{days}d", interval='1m')
+    frames = {}
+    for timeframe in timeframes:
+        frames[timeframe] = base if timeframe == '1m' else resample_ohlcv(base, timeframe, prepost)
+    return frames
+
+
+def get_timeframe_ohlcv(ticker, period='5d', interval='5m', prepost=True):
+    """
+    單一週期的K線: 'Nd' period 且在 1 分鐘數據可回溯範圍內時由緩存的 1 分鐘K線合成 (各週期共用一次下載)，
+    否則按原週期讀取
+    """
+    days = period_days(period)
+    if interval in TIMEFRAMES and days is not None and days <= MAX_LOOKBACK_DAYS['1m']:
+        return load_timeframes(ticker, (interval,), days=days, prepost=prepost)[interval]
+    return get_cached_ohlcv(ticker, period=period, interval=interval)
+
+
+def confluence_report(frames, profile='split', tolerance=0.005, weights=None, min_bars=20):
+    """
+    各週期分別運行分析，合併相近的水平並按出現的週期加權評分
+    :param frames: {週期: DataFrame}，見 load_timeframes
+    :param tolerance: 相距現價比例以內的水平視為同一水平
+    :param min_bars: K線少於此數的週期跳過
+    :return: 每個綜合水平一行，出現的週期數多的在前，其次按分數:
+             level, kind (support / resistance), score, timeframes (出現的週期數), sources, distance (%)
+    """
+    weights = weights or TIMEFRAME_WEIGHTS
+    # K線最多的 (最短) 週期的最後收盤價作為現價
+    base = max(frames.values(), key=len)
+    current_price = float(base['close'].iloc[-1])
+
+    values, scores, sources = [], [], []
+    for timeframe, df in frames.items():
+        if len(df) < min_bars:
+            print(f"跳過 {timeframe}: 只有 {len(df)} 根K線")
+            continue
+        results = SupportResistanceAnalyzer(df, profile=profile).run_all_analysis()
+        for row in results_to_rows(timeframe, results):
+            values.append(row['level'])
+            scores.append(weights.get(timeframe, 1.0))
+            sources.append(f"{timeframe} {row['method']}")
+
+    columns = ['level', 'kind', 'score', 'timeframes', 'sources', 'distance']
+    if not values:
+        return pd.DataFrame(columns=columns)
+
+    merged = merge_levels(values, current_price * tolerance, weights=scores, sources=sources, anchor='gap')
+    levels = merged['level']
+    report = pd.DataFrame({
+        'level': levels.round(4),
+        'kind': np.where(levels < current_price, 'support', 'resistance'),
+        'score': merged['weight'],
+        'timeframes': [len({s.split(' ', 1)[0] for s in group}) for group in merged['sources']],
+        'sources': [', '.join(dict.fromkeys(group)) for group in merged['sources']],
+        'distance': ((levels - current_price) / current_price * 100).round(2),
+    })
+    report = report.sort_values(['timeframes', 'score'], ascending=False, kind='stable')
+    return report.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # 用法: python timeframes.py [代碼] [天數]
+    TICKER = sys.argv[1] if len(sys.argv) > 1 else 'icct'
+    DAYS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    frames = load_timeframes(TICKER, timeframes=('1m', '5m', '15m', '1h', '1d'), days=DAYS)
+    for timeframe, df in frames.items():
+        print(f"{timeframe}: {len(df)} 根K線")
+
+    report = confluence_report(frames)
+    print(f"\n📊 {TICKER.upper()} 多週期共振水平 (多個週期同時出現的水平排在前面)")
+    print(report.head(15).to_string(index=False))
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+def _window_sums(values, window):
+    """以累積和計算每個窗口的總和，索引 j 對應結束於 j 的窗口"""
+    cum = np.concatenate(([0.0], np.cumsum(values)))
+    out = np.full(len(values), np.nan)
+    out[window - 1:] = cum[window:] - cum[:-window]
+    return out
+
+
+def rolling_linregress(y, window):
+    """
+    一次計算所有滾動窗口的最小二乘回歸 (O(n)，取代逐窗口 stats.linregress)
+    窗口內 x = 0..window-1，索引 j 的結果對應結束於第 j 根 (含) 的窗口
+    含 NaN 的窗口或不足 window 根的位置返回 NaN
+    :return: (slope, intercept) 兩個與 y 等長的陣列
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    slope = np.full(n, np.nan)
+    intercept = np.full(n, np.nan)
+    if window < 2 or n < window:
+        return slope, intercept
+
+    missing = ~np.isfinite(y)
+    # 先扣除均值，減少累積和的數值誤差
+    center = np.nanmean(y) if not missing.all() else 0.0
+    y0 = np.where(missing, 0.0, y - center)
+    k = np.arange(n, dtype=np.float64)
+
+    sum_y = _window_sums(y0, window)
+    sum_ky = _window_sums(k * y0, window)
+    n_missing = _window_sums(missing.astype(np.float64), window)
+
+    # 窗口內的 x = k - start，Σxy = Σky - start·Σy
+    start = k - (window - 1)
+    sum_xy = sum_ky - start * sum_y
+    sum_x = window * (window - 1) / 2.0
+    sum_xx = (window - 1) * window * (2 * window - 1) / 6.0
+    denom = window * sum_xx - sum_x ** 2
+
+    slope = (window * sum_xy - sum_x * sum_y) / denom
+    intercept = (sum_y - slope * sum_x) / window + center
+
+    invalid = np.isnan(sum_y) | (n_missing > 0)
+    slope[invalid] = np.nan
+    intercept[invalid] = np.nan
+    return slope, intercept
+
+
+def rolling_trendline(y, window):
+    """每個窗口回歸線在窗口最後一根的取值"""
+    slope, intercept = rolling_linregress(y, window)
+    return intercept + slope * (window - 1)
+
+
+def trendline_series(low, high, window):
+    """
+    支撐/阻力趨勢線序列：第 i 根的值由前 window 根 (不含第 i 根) 擬合，避免使用未來數據
+    :return: (support, resistance) 與輸入等長的陣列，前 window 根為 NaN
+    """
+    support = np.full(len(low), np.nan)
+    resistance = np.full(len(high), np.nan)
+    support[1:] = rolling_trendline(low, window)[:-1]
+    resistance[1:] = rolling_trendline(high, window)[:-1]
+    return support, resistance
+
+
+def last_valid(values):
+    """序列中最後一個有效值，全部無效時返回 None"""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(values))
+    if len(valid) == 0:
+        return None
+    return float(values[valid[-1]])
+
+
+def _sample_offsets(length, max_points, seed=None):
+    """點數超過 max_points 時以固定種子抽樣，保證結果可重現"""
+    if max_points is None or length <= max_points:
+        return np.arange(length)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(length, size=max_points, replace=False))
+
+
+def _theil_sen_windows(windows, offsets):
+    """對 (窗口數, 窗口長度) 矩陣逐行計算 Theil-Sen 斜率與截距"""
+    i, j = np.triu_indices(len(offsets), k=1)
+    dx = (offsets[j] - offsets[i]).astype(np.float64)
+    slopes = (windows[:, offsets[j]] - windows[:, offsets[i]]) / dx
+    slope = np.median(slopes, axis=1)
+
+    x = np.arange(windows.shape[1], dtype=np.float64)
+    intercept = np.median(windows - slope[:, None] * x, axis=1)
+    return slope, intercept
+
+
+def theil_sen(y, max_points=50, seed=None):
+    """
+    Theil-Sen 穩健回歸 (上三角兩兩斜率取中位數)
+    :param max_points: 點數上限，超過時以 seed 抽樣計算斜率
+    :return: (slope, intercept)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) < 2:
+        return np.nan, np.nan
+    offsets = _sample_offsets(len(y), max_points, seed)
+    slope, intercept = _theil_sen_windows(y[None, :], offsets)
+    return float(slope[0]), float(intercept[0])
+
+
+def rolling_theil_sen(y, window, ends=None, max_points=50, seed=None, chunk_size=4096):
+    """
+    批量計算滾動窗口的 Theil-Sen 回歸，索引與 rolling_linregress 相同 (窗口結束位置)
+    :param ends: 只計算這些結束位置的窗口，預設全部
+    :param chunk_size: 每批處理的窗口數，限制兩兩斜率矩陣的記憶體
+    :return: (slope, intercept)，ends 為 None 時與 y 等長，否則與 ends 等長
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if ends is None:
+        ends = np.arange(window - 1, n)
+        slope = np.full(n, np.nan)
+        intercept = np.full(n, np.nan)
+        target = ends
+    else:
+        ends = np.asarray(ends, dtype=np.int64)
+        slope = np.full(len(ends), np.nan)
+        intercept = np.full(len(ends), np.nan)
+        target = np.arange(len(ends))
+
+    valid = (ends >= window - 1) & (ends < n)
+    if window < 2 or n < window or not valid.any():
+        return slope, intercept
+
+    views = np.lib.stride_tricks.sliding_window_view(y, window)
+    offsets = _sample_offsets(window, max_points, seed)
+    ends, target = ends[valid], target[valid]
+
+    for start in range(0, len(ends), chunk_size):
+        stop = start + chunk_size
+        windows = views[ends[start:stop] - (window - 1)]
+        s, b = _theil_sen_windows(windows, offsets)
+        slope[target[start:stop]] = s
+        intercept[target[start:stop]] = b
+    return slope, intercept
@@ -0,0 +1,132 @@
+import numpy as np
+
+# 成交量分配模式
+#   range        - K線覆蓋的每個價格區間都計入全部成交量 (與舊版 high>=下界 & low<=上界 遮罩一致)
+#   proportional - 按K線在各區間的覆蓋長度比例分配成交量 (總量守恆)
+#   close        - 全部成交量計入收盤價所在區間
+#   contained    - 只統計完全落在單一區間內的K線 (與舊版 low>=下界 & high<=上界 遮罩一致)
+ALLOCATION_MODES = ('range', 'proportional', 'close', 'contained')
+
+
+def _as_arrays(high, low, close, volume):
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+
+    valid = np.isfinite(high) & np.isfinite(low) & np.isfinite(close) & np.isfinite(volume)
+    if not valid.all():
+        high, low, close, volume = high[valid], low[valid], close[valid], volume[valid]
+    return high, low, close, volume
+
+
+def _range_allocation(high, low, volume, edges, n_bins):
+    # 每根K線覆蓋的區間範圍 [first, last]，用差分陣列一次累加
+    first = np.searchsorted(edges[1:], low, side='left')
+    last = np.searchsorted(edges[:-1], high, side='right') - 1
+    ok = (first <= last) & (first < n_bins) & (last >= 0)
+
+    diff = np.bincount(first[ok], weights=volume[ok], minlength=n_bins + 1)
+    diff -= np.bincount(last[ok] + 1, weights=volume[ok], minlength=n_bins + 1)
+    return np.cumsum(diff[:n_bins])
+
+
+def _point_allocation(price, volume, edges, n_bins):
+    # 單一價格落點 (收盤價或零波幅K線)，超出範圍的歸入首尾區間
+    idx = np.clip(np.searchsorted(edges, price, side='right') - 1, 0, n_bins - 1)
+    return np.bincount(idx, weights=volume, minlength=n_bins)[:n_bins]
+
+
+def _proportional_allocation(high, low, volume, edges, n_bins):
+    flat = high <= low
+    hist = np.zeros(n_bins)
+    if flat.any():
+        hist += _point_allocation(low[flat], volume[flat], edges, n_bins)
+
+    span = ~flat
+    if not span.any():
+        return hist
+    high, low, volume = high[span], low[span], volume[span]
+
+    # F(x) = 價格 x 以下的累積成交量，成交量在 [low, high] 內均勻分布
+    # F(x) = Σ_{high<=x} v + x·Σ_{active} d - Σ_{active} d·low，active 為 low<x<high 的K線
+    density = volume / (high - low)
+
+    by_low = np.argsort(low, kind='stable')
+    low_sorted = low[by_low]
+    cum_d_low = np.concatenate(([0.0], np.cumsum(density[by_low])))
+    cum_dl_low = np.concatenate(([0.0], np.cumsum((density * low)[by_low])))
+
+    by_high = np.argsort(high, kind='stable')
+    high_sorted = high[by_high]
+    cum_d_high = np.concatenate(([0.0], np.cumsum(density[by_high])))
+    cum_dl_high = np.concatenate(([0.0], np.cumsum((density * low)[by_high])))
+    cum_v_high = np.concatenate(([0.0], np.cumsum(volume[by_high])))
+
+    n_started = np.searchsorted(low_sorted, edges, side='left')
+    n_finished = np.searchsorted(high_sorted, edges, side='right')
+
+    active_d = cum_d_low[n_started] - cum_d_high[n_finished]
+    active_dl = cum_dl_low[n_started] - cum_dl_high[n_finished]
+    cumulative = cum_v_high[n_finished] + edges * active_d - active_dl
+
+    # 低於首個邊界或高於最後邊界的部分歸入首尾區間，保持總量守恆
+    cumulative[0] = 0.0
+    cumulative[-1] = volume.sum()
+    hist += np.maximum(np.diff(cumulative), 0.0)
+    return hist
+
+
+def _contained_allocation(high, low, volume, edges, n_bins):
+    # 區間 j 滿足 low>=edges[j] & high<=edges[j+1] 即 first <= j <= last；
+    # 一般只有一個區間，零波幅K線剛好在內部邊界上時同時計入上下兩個區間
+    last = np.minimum(np.searchsorted(edges, low, side='right') - 1, n_bins - 1)
+    first = np.maximum(np.searchsorted(edges, high, side='left') - 1, 0)
+    ok = first <= last
+
+    diff = np.bincount(first[ok], weights=volume[ok], minlength=n_bins + 1)
+    diff -= np.bincount(last[ok] + 1, weights=volume[ok], minlength=n_bins + 1)
+    return np.cumsum(diff[:n_bins])
+
+
+def volume_at_price(high, low, close, volume, bin_edges, mode='range'):
+    """
+    將每根K線的成交量分配到價格區間 (單次 NumPy 計算，不逐區間建立遮罩)
+    :param bin_edges: 遞增的價格區間邊界，長度為區間數 + 1
+    :param mode: 分配模式，見 ALLOCATION_MODES
+    :return: 每個區間的成交量 (長度 len(bin_edges) - 1)
+    """
+    if mode not in ALLOCATION_MODES:
+        raise ValueError(f"Unknown volume profile mode: {mode}")
+
+    edges = np.asarray(bin_edges, dtype=np.float64)
+    n_bins = len(edges) - 1
+    if n_bins < 1:
+        return np.zeros(0)
+
+    high, low, close, volume = _as_arrays(high, low, close, volume)
+    if len(volume) == 0:
+        return np.zeros(n_bins)
+
+    if mode == 'range':
+        return _range_allocation(high, low, volume, edges, n_bins)
+    if mode == 'proportional':
+        return _proportional_allocation(high, low, volume, edges, n_bins)
+    if mode == 'close':
+        return _point_allocation(close, volume, edges, n_bins)
+    return _contained_allocation(high, low, volume, edges, n_bins)
+
+
+def volume_profile_df(df, bin_edges, mode='range'):
+    """從 OHLCV DataFrame (小寫欄位) 計算成交量分布"""
+    return volume_at_price(
+        df['high'].to_numpy(), df['low'].to_numpy(),
+        df['close'].to_numpy(), df['volume'].to_numpy(),
+        bin_edges, mode=mode
+    )
+
+
+def bin_centers(bin_edges):
+    """區間中點價格"""
+    edges = np.asarray(bin_edges, dtype=np.float64)
+    return (edges[:-1] + edges[1:]) / 2
@@ -0,0 +1,170 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from indicators import session_ids, session_mask
+
+# 標準差通道的倍數
+VWAP_BANDS = (1.0, 2.0)
+
+
+def _band_name(side, multiplier):
+    return f"{side}_{multiplier:g}"
+
+
+def anchored_vwap(high, low, close, volume, anchors, ends=None, bands=VWAP_BANDS):
+    """
+    多個錨點的 VWAP 與標準差通道，所有錨點在 (錨點, K線) 長格式上分組累加，一次向量化計算
+    :param anchors: 錨點K線位置
+    :param ends: 每個錨點的結束位置 (不含)，None 為數據結尾
+    :param bands: 通道的標準差倍數 (成交量加權)
+    :return: 長格式 dict，每個 (錨點, K線) 一項:
+             anchor   - 錨點序號 (anchors 中的位置)
+             position - K線位置
+             vwap, upper_1, lower_1, ... - 錨點到該K線 (含) 的 VWAP 與通道
+    """
+    high, low, close, volume = (np.asarray(a, dtype=np.float64) for a in (high, low, close, volume))
+    n = len(close)
+    anchors = np.asarray(anchors, dtype=np.int64)
+    ends = np.full(len(anchors), n, dtype=np.int64) if ends is None else np.asarray(ends, dtype=np.int64)
+
+    typical = (high + low + close) / 3
+    valid = np.isfinite(typical) & np.isfinite(volume)
+
+    lengths = np.clip(np.minimum(ends, n) - anchors, 0, None)
+    owner = np.repeat(np.arange(len(anchors)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    position = anchors[owner] + np.arange(lengths.sum()) - offsets[owner]
+
+    # 每個錨點以錨點K線的價格為中心，在 (錨點, K線) 長格式上分段累加:
+    # 結果只取決於錨點自己的K線，不受同一批其他股票價格量級的影響 (見 vwap_table)
+    ref = typical[np.minimum(anchors, n - 1)] if n else np.zeros(len(anchors))
+    ref = np.where(np.isfinite(ref), ref, 0.0)
+    ok = valid[position]
+    w = np.where(ok, volume[position], 0.0)
+    q = np.where(ok, typical[position] - ref[owner], 0.0)
+    sums = pd.DataFrame({'v': w, 'q': w * q, 'q2': w * q * q}).groupby(owner, sort=False).cumsum()
+    cum_v, cum_q, cum_q2 = (sums[c].to_numpy() for c in ('v', 'q', 'q2'))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_q = np.where(cum_v > 0, cum_q / cum_v, np.nan)
+        var = cum_q2 / cum_v - mean_q * mean_q
+    std = np.sqrt(np.clip(var, 0.0, None))
+
+    result = {'anchor': owner, 'position': position, 'vwap': ref[owner] + mean_q}
+    for multiplier in bands:
+        result[_band_name('upper', multiplier)] = result['vwap'] + std * multiplier
+        result[_band_name('lower', multiplier)] = result['vwap'] - std * multiplier
+    return result
+
+
+def anchor_positions(df, anchors='session'):
+    """
+    錨點K線位置
+    :param anchors: 'session' - 每個交易時段的第一根K線
+                    'hod' / 'lod' - 每個交易時段最高價 / 最低價的K線 (收市後才能確定)
+                    時間或時間列表 (如新聞時間) - 該時間或之後的第一根K線
+    :return: 升序排列的位置陣列
+    """
+    n = len(df)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    sessions = session_ids(df.index)
+    if isinstance(anchors, str):
+        if anchors == 'session':
+            return np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+        if anchors in ('hod', 'lod'):
+            column = 'high' if anchors == 'hod' else 'low'
+            values = pd.Series(df[column].to_numpy(dtype=np.float64))
+            grouped = values.groupby(sessions, sort=False)
+            positions = grouped.idxmax() if anchors == 'hod' else grouped.idxmin()
+            return np.sort(positions.dropna().to_numpy(dtype=np.int64))
+        raise ValueError(f"Unknown VWAP anchor: {anchors}")
+
+    times = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(anchors)))
+    if df.index.tz is not None:
+        times = times.tz_localize(df.index.tz) if times.tz is None else times.tz_convert(df.index.tz)
+    positions = df.index.searchsorted(times)
+    return np.unique(positions[positions < n]).astype(np.int64)
+
+
+def _session_ends(df, positions):
+    """每個位置所在交易時段的結束位置 (不含)"""
+    sessions = session_ids(df.index)
+    bounds = np.r_[np.flatnonzero(sessions[1:] != sessions[:-1]) + 1, len(df)]
+    return bounds[np.searchsorted(bounds, positions, side='right')]
+
+
+def vwap_table(frames, anchors='session', prepost=True, bands=VWAP_BANDS, until=None):
+    """
+    整個觀察名單的錨定 VWAP: 所有股票的K線首尾相接，全部錨點在一次向量化計算中完成
+    :param frames: {代碼: DataFrame} 或單個 DataFrame
+    :param anchors: 見 anchor_positions；也可以是 {代碼: 錨點}
+    :param prepost: False 時只使用正常交易時段的K線
+    :param until: None 計算到數據結尾；'session' 到錨點所在交易時段結束 ('session' 錨點總是如此)
+    :return: 長格式 DataFrame: ticker, anchor (錨點時間), datetime, vwap, upper_1, lower_1, ...
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = {None: frames}
+    if until not in (None, 'session'):
+        raise ValueError(f"Unknown VWAP range: {until}")
+
+    parts, starts, ends, tickers = [], [], [], []
+    offset = 0
+    for ticker, df in frames.items():
+        if not prepost:
+            df = df[session_mask(df.index, prepost=False)]
+        ticker_anchors = anchors.get(ticker, 'session') if isinstance(anchors, dict) else anchors
+        positions = anchor_positions(df, ticker_anchors)
+        if until == 'session' or (isinstance(ticker_anchors, str) and ticker_anchors == 'session'):
+            stop = _session_ends(df, positions)
+        else:
+            stop = np.full(len(positions), len(df), dtype=np.int64)
+        parts.append(df)
+        starts.append(positions + offset)
+        ends.append(stop + offset)
+        tickers.extend([ticker] * len(positions))
+        offset += len(df)
+
+    columns = ['ticker', 'anchor', 'datetime', 'vwap'] + [
+        _band_name(side, m) for m in bands for side in ('upper', 'lower')]
+    if offset == 0:
+        return pd.DataFrame(columns=columns)
+
+    bars = pd.concat([df[['high', 'low', 'close', 'volume']] for df in parts])
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+    result = anchored_vwap(bars['high'], bars['low'], bars['close'], bars['volume'],
+                           starts, ends, bands=bands)
+
+    owner = result.pop('anchor')
+    position = result.pop('position')
+    table = pd.DataFrame({
+        'ticker': np.asarray(tickers, dtype=object)[owner],
+        'anchor': bars.index[starts][owner],
+        'datetime': bars.index[position],
+        **result,
+    })
+    return table[columns]
+
+
+def session_vwap_frame(df, prepost=True, bands=VWAP_BANDS):
+    """
+    每個交易時段重新累積的 VWAP 與通道，索引與 df 相同
+    prepost=False 時只累積正常交易時段，盤前盤後K線為 NaN
+    """
+    table = vwap_table(df, anchors='session', prepost=prepost, bands=bands)
+    return table.drop(columns=['ticker', 'anchor']).set_index('datetime').reindex(df.index)
+
+
+if __name__ == "__main__":
+    # 用法: python vwap.py [代碼...]
+    # 觀察名單每隻股票從最近一天最高價起算的 VWAP 與 2 倍標準差通道
+    from sr_batch import load_frames
+
+    WATCHLIST = sys.argv[1:] or ['icct', 'mspr', 'bjdx', 'aapl']
+    frames = load_frames(WATCHLIST, period='5d', interval='1m')
+    table = vwap_table(frames, anchors='hod')
+    latest = table.groupby('ticker', sort=False).tail(1).copy()
+    latest['close'] = [frames[t]['close'].iloc[-1] for t in latest['ticker']]
+    print(latest[['ticker', 'anchor', 'close', 'vwap', 'lower_2', 'upper_2']].round(4).to_string(index=False))
@@ -1,16 +1,18 @@
-import yfinance as yf
+import os
+import sys
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import pandas as pd
 
+# 共用 get_charts 的本地K線緩存
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'get_charts'))
+from bar_store import get_cached_ohlcv
+
 # Set the stock symbol
 stock_symbol = 'AAPL'
 
-# Get the ticker object
-ticker = yf.Ticker(stock_symbol)
-
-# Get the historical data for the last day at 1-minute intervals
-hist = ticker.history(period='1d', interval='1m')
+# Get the historical data for the last day at 1-minute intervals (cached, only new bars are downloaded)
+hist = get_cached_ohlcv(stock_symbol, period='1d', interval='1m').rename(columns=str.capitalize)
 
 # Plotting the OHLC data
 fig, ax = plt.subplots(figsize=(10, 6))
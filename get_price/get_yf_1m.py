@@ -1,15 +1,20 @@
-import yfinance as yf
+import os
+import sys
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import pytz
 
+# 共用 get_charts 的本地K線緩存
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'get_charts'))
+from bar_store import get_cached_ohlcv
+from chart_overlays import ChartOverlays
+
 # 設定股票代碼
 stock_symbol = 'bjdx'
 
-# 取得歷史數據（包含成交量）
-ticker = yf.Ticker(stock_symbol)
-hist = ticker.history(period='1d', interval='1m')
+# 取得歷史數據（包含成交量，本地緩存只下載新增K線）
+hist = get_cached_ohlcv(stock_symbol, period='1d', interval='1m').rename(columns=str.capitalize)
 
 # 轉換時區（美東時間 ET）
 et_tz = pytz.timezone('America/New_York')
@@ -46,22 +51,11 @@ fig.add_trace(go.Bar(
     name="Volume"
 ), row=2, col=1)
 
-# **加上時間間隔線**
-for i, time in enumerate(hist["Time"]):
-    if ":30" in time:  # **30 分鐘間隔 → 25% 透明線**
-        line_width = 0.5
-    #if ":15" in time or ":45" in time:  # **15 分鐘間隔 → 10% 透明線**
-        #line_width = 0.5
-    #elif ":05" in time or ":10" in time or ":20" in time or ":25" in time or ":35" in time or ":40" in time or ":50" in time or ":55" in time:  # **5 分鐘間隔 → 3% 透明線**
-    #    line_width = 1
-    else:
-        continue  # 跳過不需要的時間
-    
-    fig.add_shape(type="line",
-                  x0=hist["Datetime"].iloc[i], y0=0,
-                  x1=hist["Datetime"].iloc[i], y1=1,
-                  xref='x', yref='paper',
-                  line=dict(color="white", width=line_width, dash="dot"))
+# **加上時間間隔線**（30 分鐘間隔，一次寫入 layout）
+overlays = ChartOverlays()
+overlays.time_gridlines(hist["Datetime"], minutes=(30,), skip_ends=False)
+#overlays.time_gridlines(hist["Datetime"], minutes=(15, 45), skip_ends=False)  # **15 分鐘間隔**
+overlays.apply(fig)
 
 # **在成交量區加上橫線**
 volume_max = hist['Volume'].max()